@@ -1,27 +1,60 @@
-
+import asyncio
+import logging
 from datetime import datetime, timedelta
 from fastapi import FastAPI
 
 
 from src.api.hooks   import router as HooksRouter 
 from src.api.health import router as HealthRouter
+from src.api.admin import router as AdminRouter
 from contextlib import asynccontextmanager
 
 
-from src.utils import build_agent, build_git, build_model
+from src.utils import build_agent, build_git, build_model, build_artifacts, build_scheduler, build_jobs, build_templates, build_profiler, build_admission
+from src.utils import get_config, get_jobs, get_profiler, init_logging
+from src.utils import get_agent, get_git, get_scheduler
+
+from src.tasks import process_issue_task, recover_interrupted_issues
+from src.scheduler import issue_priority, issue_project, issue_key
+from src.logs import stop_logging
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # raise the sails
-    await build_agent()
-    await build_model()
-    await build_git()
+    init_logging()
+    await build_profiler()
+    await build_admission()
+    if get_config().JOB_QUEUE:
+        # ingress only: validate and enqueue, agent runs in `python -m src.worker`
+        await build_git()
+        await build_jobs()
+        # push webhooks are handled here, workers reload the index saved to the shared TEMPLATE_INDEX_FOLDER
+        await build_templates()
+    else:
+        await build_agent()
+        await build_model()
+        await build_git()
+        await build_artifacts()
+        await build_scheduler()
+        await build_templates()
+
+        # continue runs interrupted by the previous process, workers take them over by lease expiry
+        agent, git, scheduler = get_agent(), get_git(), get_scheduler()
+        app.state.recovery = asyncio.create_task(recover_interrupted_issues(
+            agent, git, 
+            lambda data: scheduler.submit(process_issue_task, data, agent, git, priority=issue_priority(data), project_id=issue_project(data), key=issue_key(data))
+        ))
     
-    print('Application ready to work.')
+    logger.info('Application ready to work.')
     yield
     # Finish line
-    print('Work finished. Thanks')
-    pass
+    if get_jobs():
+        await get_jobs().close()
+    get_profiler().close()
+    logger.info('Work finished. Thanks')
+    stop_logging()
 
 app = FastAPI(
     title="Back-end server for DE chat application",
@@ -30,6 +63,7 @@ app = FastAPI(
 
 app.include_router(HooksRouter)
 app.include_router(HealthRouter)
+app.include_router(AdminRouter)
 
 
 if __name__ == '__main__':
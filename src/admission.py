@@ -0,0 +1,135 @@
+import os
+import time
+import hmac
+
+from collections import OrderedDict
+
+
+# Webhook events processed by `/process_issue`, other GitLab events are acknowledged and ignored
+ACCEPTED_KINDS = {'issue'}
+# `X-Gitlab-Event` header values of these events, checked right after the secret token
+ACCEPTED_EVENTS = {'Issue Hook', 'Confidential Issue Hook'}
+
+
+class RequestRejected(Exception):
+    def __init__(self, status:int, reason:str, retry_after:float=None):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def check_token(token:str, secret:str) -> bool:
+    """
+    Constant time comparison of `X-Gitlab-Token` with the webhook secret, any token is accepted without secret.
+    """
+    if not secret:
+        return True
+    return bool(token) and hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8'))
+
+
+class RateLimiter():
+    """
+    Token bucket per source: `rate` requests per second with bursts up to `burst`.
+    Least recently seen sources are forgotten above `max_sources`.
+    """
+    def __init__(self, rate:float=1.0, burst:int=20, max_sources:int=1000):
+        self.rate = rate
+        self.burst = burst
+        self.max_sources = max_sources
+        self._buckets = OrderedDict()
+
+    def acquire(self, source:str) -> float:
+        """
+        Take a token of the source, returns 0 when allowed or seconds until the next token.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(source, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+
+        self._buckets[source] = (tokens, now)
+        while len(self._buckets) > self.max_sources:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+def current_rss_mb() -> float:
+    """
+    Resident memory of the process, None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+class AdmissionController():
+    """
+    Admission of issue webhooks before the body is parsed and a run is queued:
+    secret token, body size, per-source rate and pod load (in-flight runs, memory, event loop lag).
+    Overloaded pod answers 503 with Retry-After, so the sender retries later.
+    """
+    def __init__(self, secret:str=None, max_body_bytes:int=1048576, rate:float=1.0, burst:int=20,
+                 max_accepted_runs:int=0, max_memory_mb:int=0, max_loop_lag:float=0, retry_after:int=30):
+        self.secret = secret
+        self.max_body_bytes = max_body_bytes
+        self.limiter = RateLimiter(rate=rate, burst=burst) if rate else None
+        self.max_accepted_runs = max_accepted_runs
+        self.max_memory_mb = max_memory_mb
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.rejected = {}
+
+    def _reject(self, status:int, reason:str, retry_after:float=None):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise RequestRejected(status, reason, retry_after)
+
+    def check_token(self, token:str):
+        if not check_token(token, self.secret):
+            self._reject(401, "invalid token")
+
+    def check_request(self, source:str, token:str, content_length:str, rate_limit:bool=True):
+        """
+        Checks done on headers only: secret token, declared body size, source rate.
+        Without `rate_limit` the request does not take tokens of the source bucket.
+        """
+        self.check_token(token)
+
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            self._reject(413, "body too large")
+
+        if self.limiter and rate_limit:
+            wait = self.limiter.acquire(source)
+            if wait:
+                self._reject(429, "rate limited", wait)
+
+    def check_body_size(self, size:int):
+        if size > self.max_body_bytes:
+            self._reject(413, "body too large")
+
+    def check_load(self, accepted_runs:int=None, loop_lag:float=None):
+        """
+        Shed load when the pod has too many accepted runs, too much memory in use or a lagging event loop.
+        """
+        if self.max_accepted_runs and accepted_runs is not None and accepted_runs >= self.max_accepted_runs:
+            self._reject(503, "too many runs", self.retry_after)
+
+        if self.max_memory_mb:
+            rss = current_rss_mb()
+            if rss is not None and rss >= self.max_memory_mb:
+                self._reject(503, "memory", self.retry_after)
+
+        if self.max_loop_lag and loop_lag is not None and loop_lag >= self.max_loop_lag:
+            self._reject(503, "event loop lag", self.retry_after)
+
+    def stats(self) -> dict:
+        return {"rejected": dict(self.rejected), "rss_mb": current_rss_mb()}
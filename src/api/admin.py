@@ -0,0 +1,80 @@
+import hmac
+import asyncio
+from typing import Optional, Literal
+
+from pydantic import BaseModel, Field
+
+from fastapi import APIRouter, HTTPException
+from fastapi import Depends, Header
+from fastapi.responses import FileResponse
+
+from src.utils import get_config, get_profiler
+from src.profiling import spans
+
+
+def check_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoints are hidden when ADMIN_TOKEN is not set.
+    """
+    token = get_config().ADMIN_TOKEN
+    if not token:
+        raise HTTPException(404)
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode('utf-8'), token.encode('utf-8')):
+        raise HTTPException(403, "Permissions denied")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(check_admin_token)])
+
+
+class ProfileRequest(BaseModel):
+    duration: float = Field(60, gt=0, description="Seconds to sample, limited by PROFILE_MAX_SECONDS")
+    issue_id: Optional[int] = Field(None, description="Sample only event loop tasks of this issue run, whole process by default")
+    format: Literal['speedscope', 'collapsed'] = Field('speedscope', description="speedscope JSON or collapsed stacks for flamegraph.pl")
+
+
+@router.post('/profile/start')
+async def start_profile(request: ProfileRequest, profiler=Depends(get_profiler)):
+    try:
+        return profiler.start(duration=request.duration, issue_id=request.issue_id, format=request.format)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+
+
+@router.post('/profile/stop')
+async def stop_profile(profiler=Depends(get_profiler)):
+    # joins sampler thread and writes the file
+    res = await asyncio.to_thread(profiler.stop)
+    if res is None:
+        raise HTTPException(404, "Profiling was not started")
+    return res
+
+
+@router.get('/profile')
+async def profile_status(profiler=Depends(get_profiler)):
+    return profiler.status()
+
+
+@router.get('/profile/{name}')
+async def download_profile(name: str, profiler=Depends(get_profiler)):
+    path = profiler.profile_path(name)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, filename=name)
+
+
+@router.get('/stalls')
+async def loop_stalls(profiler=Depends(get_profiler)):
+    """
+    Recent event loop stalls with the stack that blocked the loop.
+    """
+    if profiler.watchdog is None:
+        return {"threshold_ms": None, "stalls": []}
+    return {"threshold_ms": round(profiler.watchdog.threshold * 1000), "stalls": list(profiler.watchdog.stalls)}
+
+
+@router.get('/spans')
+async def span_stats(run_id: Optional[str] = None):
+    """
+    Count, total and max seconds per span (tool.*, git.*, llm, checkpointer.*) for the process or one run.
+    """
+    return {"run_id": run_id, "spans": spans.snapshot(run_id)}
@@ -1,9 +1,11 @@
 import asyncio
 
 from fastapi import APIRouter
-from fastapi import Response
+from fastapi import Depends, Response
 from fastapi.responses import StreamingResponse
 
+from src.utils import get_scheduler, get_jobs, get_admission
+
 router = APIRouter()
 
 @router.get('/healthcheck')
@@ -11,6 +13,24 @@ async def healthcheck():
     return Response("I'm OK", 200)
 
 
+@router.get('/scheduler')
+async def scheduler_stats(scheduler=Depends(get_scheduler), jobs=Depends(get_jobs)):
+    """
+    Queued and running issues, queue wait time per priority class (seconds).
+    """
+    if jobs:
+        return {"jobs": await jobs.stats()}
+    return scheduler.stats()
+
+
+@router.get('/admission')
+async def admission_stats(admission=Depends(get_admission)):
+    """
+    Rejected webhooks by reason and process memory.
+    """
+    return admission.stats()
+
+
 @router.get('/ping')
 async def pong():
     return Response("pong", 200)
@@ -1,5 +1,11 @@
+import json
+import math
+import asyncio
 from uuid import uuid1
 from datetime import datetime
+from typing import Optional, Literal
+
+from pydantic import BaseModel, Field
 
 from fastapi import APIRouter, BackgroundTasks
 from fastapi import Depends, Request, Response
@@ -7,15 +13,143 @@ from fastapi import Depends, Request, Response
 from src.utils import get_model
 from src.utils import get_agent
 from src.utils import get_git
+from src.utils import get_scheduler
+from src.utils import get_jobs
+from src.utils import get_templates
+from src.utils import get_admission
+from src.utils import get_profiler
 
-from src.tasks import process_issue_task
+from src.tasks import ISSUE_TASKS, issue_task_kind
+from src.batch import collect_issues, run_batch, source_key
+from src.scheduler import issue_priority, issue_project, issue_key
+from src.spec import issue_iid
+from src.admission import RequestRejected, ACCEPTED_KINDS, ACCEPTED_EVENTS, check_token
 
 router = APIRouter()
 
+async def read_body(request: Request, admission) -> bytes:
+    """
+    Read request body up to the size limit, body without Content-Length is checked while streaming.
+    """
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        admission.check_body_size(len(body))
+    return bytes(body)
+
+
 @router.post("/process_issue")
-async def read_users_me(request: Request, background_tasks: BackgroundTasks, agent=Depends(get_agent), git=Depends(get_git)):
-    data = await request.json()
+async def read_users_me(request: Request, agent=Depends(get_agent), git=Depends(get_git), scheduler=Depends(get_scheduler), jobs=Depends(get_jobs), 
+                        admission=Depends(get_admission), profiler=Depends(get_profiler)):
+    watchdog = profiler.watchdog if profiler else None
+    try:
+        admission.check_token(request.headers.get('X-Gitlab-Token'))
+        # other events of a misconfigured hook do not take rate of the source and are not shed under load;
+        # requests without the header (manual calls) are filtered by object_kind below
+        event = request.headers.get('X-Gitlab-Event')
+        if event is not None and event not in ACCEPTED_EVENTS:
+            return Response("Ignored", 200)
+
+        admission.check_request(
+            source=request.headers.get('X-Gitlab-Instance') or (request.client.host if request.client else 'unknown'),
+            token=request.headers.get('X-Gitlab-Token'),
+            content_length=request.headers.get('content-length')
+        )
+        # job queue absorbs bursts, in-process scheduler keeps all runs in memory
+        admission.check_load(
+            accepted_runs=None if jobs else scheduler.inflight(),
+            loop_lag=watchdog.recent_lag() if watchdog else None
+        )
+        data = json.loads(await read_body(request, admission))
+    except RequestRejected as e:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return Response(e.reason, e.status, headers=headers)
+    except ValueError:
+        return Response("Invalid JSON", 400)
+
+    # acknowledged, so GitLab does not retry events of other kinds (misconfigured system hook)
+    if not isinstance(data, dict) or data.get('object_kind', 'issue') not in ACCEPTED_KINDS:
+        return Response("Ignored", 200)
 
-    background_tasks.add_task(process_issue_task, data, agent, git)
+    kind = issue_task_kind(data)
+    if kind is None:
+        return Response("Ignored", 200)
+
+    if jobs:
+        await enqueue_issue(jobs, data)
+    else:
+        scheduler.submit(ISSUE_TASKS[kind], data, agent, git, priority=issue_priority(data), project_id=issue_project(data), key=issue_key(data))
 
     return Response("Issue in process", 200)
+
+
+async def enqueue_issue(jobs, data: dict, priority: str = None):
+    return await jobs.enqueue(
+        data, 
+        kind=issue_task_kind(data),
+        priority=priority or issue_priority(data), 
+        project_id=issue_project(data), 
+        issue_id=issue_iid(data)
+    )
+
+
+@router.post("/process_push")
+async def process_push(request: Request, background_tasks: BackgroundTasks, templates=Depends(get_templates), admission=Depends(get_admission)):
+    """
+    Push webhook of the target project: update templates index with changed files only.
+    """
+    try:
+        admission.check_request(
+            source=request.headers.get('X-Gitlab-Instance') or (request.client.host if request.client else 'unknown'),
+            token=request.headers.get('X-Gitlab-Token'),
+            content_length=request.headers.get('content-length'),
+            # pushes do not start runs and must not take rate of issue events
+            rate_limit=False
+        )
+        data = json.loads(await read_body(request, admission))
+    except RequestRejected as e:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return Response(e.reason, e.status, headers=headers)
+    except ValueError:
+        return Response("Invalid JSON", 400)
+
+    if not isinstance(data, dict) or data.get('object_kind') != 'push' or templates is None:
+        return Response("Ignored", 200)
+
+    background_tasks.add_task(asyncio.to_thread, templates.apply_push, data)
+
+    return Response("Templates index update in process", 200)
+
+
+class BatchRequest(BaseModel):
+    labels: list[str] = Field([], description="Process only issues with all these labels")
+    limit: Optional[int] = Field(None, description="Max number of issues")
+    concurrency: int = Field(2, ge=1, description="Issues of the batch processed at the same time")
+    priority: Optional[Literal['high', 'normal', 'low']] = Field(None, description="Priority class for all issues, by default taken from labels")
+
+
+@router.post("/process_issues/batch")
+async def process_issues_batch(batch: BatchRequest, request: Request, background_tasks: BackgroundTasks, agent=Depends(get_agent), git=Depends(get_git), scheduler=Depends(get_scheduler), jobs=Depends(get_jobs), 
+                               admission=Depends(get_admission)):
+    # same secret as issue webhooks, the batch starts runs for many issues at once
+    if not check_token(request.headers.get('X-Gitlab-Token'), admission.secret):
+        return Response("invalid token", 401)
+
+    # issues are listed page by page with blocking GitLab API calls
+    payloads = await asyncio.to_thread(collect_issues, git, labels=batch.labels, limit=batch.limit)
+
+    if jobs:
+        # concurrency is limited by worker replicas and project quota
+        for payload in payloads:
+            await enqueue_issue(jobs, payload, priority=batch.priority)
+    else:
+        background_tasks.add_task(
+            run_batch, payloads, agent, git, scheduler,
+            concurrency=batch.concurrency,
+            priority=batch.priority
+        )
+
+    return {
+        "issues": [issue_iid(x) for x in payloads],
+        "groups": len({source_key(x['object_attributes']['description']) for x in payloads}),
+    }
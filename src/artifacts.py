@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+
+from uuid import uuid4
+
+
+ARTIFACT_PREFIX = "artifact:"
+
+# Folder of issue manifests, kept when thread artifacts are cleaned up
+MANIFESTS_FOLDER = "manifests"
+
+# artifact:<thread_id>/<uuid hex>, handles come from the model and are never trusted as paths
+HANDLE = re.compile(r'^artifact:([\w.-]+)/([0-9a-f]{32})$')
+
+
+class ArtifactNotFound(Exception):
+    """
+    Handle is valid but its files are gone, e.g. the run was resumed by a process with another store folder.
+    """
+    def __init__(self, artifact_id:str):
+        super().__init__(f"Artifact not found: {artifact_id}")
+        self.artifact_id = artifact_id
+
+
+class ArtifactStore():
+    """
+    Generated files are spooled to disk and referenced by handle.
+    The agent passes `artifact:<id>` handles between tools instead of the whole file content.
+    """
+    def __init__(self, folder:str=None):
+        self.folder = folder or tempfile.mkdtemp(prefix="gitlab-agent-")
+        os.makedirs(self.folder, exist_ok=True)
+
+
+    def _thread_folder(self, thread_id:str) -> str:
+        return os.path.join(self.folder, str(thread_id))
+
+
+    def _path(self, artifact_id:str, thread_id:str=None) -> tuple[str, str]:
+        """
+        Content and metadata paths of the handle. With `thread_id` only artifacts of that thread are accessible.
+        """
+        match = HANDLE.match(artifact_id.strip())
+        if not match or (thread_id is not None and match.group(1) != str(thread_id)):
+            raise ValueError(f"Invalid artifact handle: {artifact_id}")
+
+        folder = os.path.realpath(self._thread_folder(match.group(1)))
+        if os.path.dirname(folder) != os.path.realpath(self.folder):
+            raise ValueError(f"Invalid artifact handle: {artifact_id}")
+
+        name = match.group(2)
+        return os.path.join(folder, name), os.path.join(folder, f"{name}.json")
+
+
+    def is_handle(self, value) -> bool:
+        return isinstance(value, str) and value.strip().startswith(ARTIFACT_PREFIX)
+
+
+    def stage(self, thread_id:str, kind:str, filename:str, content:str, description:str, commit_message:str, **extra) -> dict:
+        folder = self._thread_folder(thread_id)
+        os.makedirs(folder, exist_ok=True)
+
+        artifact_id = f"{ARTIFACT_PREFIX}{thread_id}/{uuid4().hex}"
+        content_path, meta_path = self._path(artifact_id)
+
+        with open(content_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        meta = {
+            "artifact_id": artifact_id,
+            "kind": kind,
+            "filename": filename,
+            "description": description,
+            "commit_message": commit_message,
+            "size": len(content),
+            "lines": content.count("\n") + 1,
+            **extra,
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        return meta
+
+
+    def meta(self, artifact_id:str, thread_id:str=None) -> dict:
+        _, meta_path = self._path(artifact_id, thread_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ArtifactNotFound(artifact_id) from None
+
+
+    def update_meta(self, artifact_id:str, **kwargs):
+        meta = self.meta(artifact_id)
+        meta.update(kwargs)
+        _, meta_path = self._path(artifact_id)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+
+    def read(self, artifact_id:str, thread_id:str=None) -> str:
+        content_path, _ = self._path(artifact_id, thread_id)
+        try:
+            with open(content_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ArtifactNotFound(artifact_id) from None
+
+
+    def resolve(self, value:str, thread_id:str=None) -> str:
+        """
+        Return file content for artifact handle, any other value is returned as is.
+        """
+        if self.is_handle(value):
+            return self.read(value.strip(), thread_id)
+        return value
+
+
+    def list(self, thread_id:str) -> list[dict]:
+        folder = self._thread_folder(thread_id)
+        if not os.path.isdir(folder):
+            return []
+
+        items = []
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".json"):
+                with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                    items.append(json.load(f))
+        return items
+
+
+    def find(self, thread_id:str, **fields) -> dict:
+        """
+        First artifact of the thread with matching metadata fields or None.
+        """
+        for meta in self.list(thread_id):
+            if all(meta.get(k) == v for k, v in fields.items()):
+                return meta
+        return None
+
+
+    def _manifest_path(self, issue_id) -> str:
+        return os.path.join(self.folder, MANIFESTS_FOLDER, f"issue-{int(issue_id)}.json")
+
+
+    def save_manifest(self, issue_id, manifest:dict):
+        path = self._manifest_path(issue_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # replaced atomically, a crash never leaves a half written manifest
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+
+    def load_manifest(self, issue_id) -> dict:
+        """
+        Manifest of generated files of the issue or None when the issue was not processed.
+        """
+        try:
+            with open(self._manifest_path(issue_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+    def cleanup(self, thread_id:str):
+        shutil.rmtree(self._thread_folder(thread_id), ignore_errors=True)
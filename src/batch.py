@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import argparse
+
+from src.gitwork import GitWorker
+from src.tasks import process_issue_task
+from src.spec import parse_parameter_table, issue_iid
+from src.scheduler import Scheduler, PRIORITY_CLASSES, issue_priority, issue_project, issue_key
+
+
+logger = logging.getLogger(__name__)
+
+
+def source_key(description:str) -> tuple:
+    """
+    Source database and table from issue parameter table, issues with the same key share schema lookups.
+    """
+    _, fields = parse_parameter_table(description)
+    return (fields.get('source_database', ''), fields.get('source_table', ''))
+
+
+def collect_issues(git:GitWorker, labels:list[str]=None, limit:int=None) -> list[dict]:
+    """
+    List open issues with pagination and return webhook-like payloads grouped by source table.
+    """
+    payloads = []
+    for issue in git.list_open_issues(labels=labels):
+        payloads.append(git.issue_payload(issue))
+        if limit and len(payloads) >= limit:
+            break
+
+    # issues of the same source table go one after another and hit the schema lookup cache
+    return sorted(payloads, key=lambda x: source_key(x['object_attributes']['description']))
+
+
+async def run_batch(payloads:list[dict], agent, git:GitWorker, scheduler:Scheduler, concurrency:int=2, priority:str=None):
+    """
+    Submit issues to the scheduler keeping at most `concurrency` issues of the batch queued or running.
+    Priority class is taken from issue labels unless `priority` is set for the whole batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(payload):
+        async with semaphore:
+            try:
+                await scheduler.submit(
+                    process_issue_task, payload, agent, git,
+                    priority=priority or issue_priority(payload),
+                    project_id=issue_project(payload),
+                    key=issue_key(payload)
+                )
+            except Exception as e:
+                logger.exception("Issue %s failed: %s", issue_iid(payload), e)
+
+    logger.info("Starting batch of %d issues, priority: %s, concurrency: %d", len(payloads), priority or 'by labels', concurrency)
+    await asyncio.gather(*[run(payload) for payload in payloads])
+    logger.info("Batch of %d issues is done", len(payloads))
+
+
+async def main(labels:list[str], limit:int, concurrency:int, priority:str, dry_run:bool):
+    from src.utils import build_agent, build_model, build_git, build_artifacts, build_scheduler, build_templates
+    from src.utils import get_agent, get_git, get_scheduler, init_logging
+
+    init_logging()
+    await build_git()
+    payloads = collect_issues(get_git(), labels=labels, limit=limit)
+
+    for payload in payloads:
+        attrs = payload['object_attributes']
+        # source database is not logged, connection strings of issues may contain credentials
+        _, source_table = source_key(attrs['description'])
+        logger.info("Issue %s: %s", issue_iid(payload), attrs['title'], extra={"issue_id": issue_iid(payload), "source_table": source_table})
+
+    if dry_run:
+        return
+
+    await build_agent()
+    await build_model()
+    await build_artifacts()
+    await build_scheduler()
+    await build_templates()
+
+    await run_batch(payloads, get_agent(), get_git(), get_scheduler(), concurrency=concurrency, priority=priority)
+
+
+if __name__ == '__main__':
+    """
+    Bulk backlog import: `python -m src.batch --labels database-to-datalake --concurrency 2`
+    """
+    arg_parser = argparse.ArgumentParser(description="Process open GitLab issues in batch")
+    arg_parser.add_argument('--labels', default='', help="Comma separated labels, all labels must match")
+    arg_parser.add_argument('--limit', type=int, default=None, help="Max number of issues")
+    arg_parser.add_argument('--concurrency', type=int, default=2, help="Issues processed at the same time")
+    arg_parser.add_argument('--priority', choices=PRIORITY_CLASSES, default=None, help="Priority class for all issues, by default taken from labels")
+    arg_parser.add_argument('--dry-run', action='store_true', help="Only list issues")
+    args = arg_parser.parse_args()
+
+    labels = [x.strip() for x in args.labels.split(',') if x.strip()]
+    asyncio.run(main(labels, args.limit, args.concurrency, args.priority, args.dry_run))
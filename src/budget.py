@@ -0,0 +1,176 @@
+import time
+
+from collections import Counter
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# Label added to the issue when its run was stopped by the budget, such issues are not recovered on restart
+BUDGET_LABEL = 'budget::exceeded'
+
+# Budget limits, 0 means unlimited
+LIMITS = ['max_tokens', 'max_seconds', 'max_llm_calls']
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason:str, usage:"RunUsage"):
+        super().__init__(f"Run budget exceeded: {reason}")
+        self.reason = reason
+        self.usage = usage
+        # stream chunks received before the stop, set by the agent
+        self.chunks = []
+
+
+class RunBudget():
+    """
+    Limits of one agent run: total tokens, wall-clock seconds, LLM calls and calls per tool.
+    `max_tool_calls` maps tool name to limit, `*` is the limit for tools not listed.
+    """
+    def __init__(self, max_tokens:int=0, max_seconds:int=0, max_llm_calls:int=0, max_tool_calls:dict[str, int]=None):
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.max_llm_calls = max_llm_calls
+        self.max_tool_calls = max_tool_calls or {}
+
+
+    @classmethod
+    def for_labels(cls, labels:list[str], defaults:dict, label_budgets:dict[str, dict]) -> "RunBudget":
+        """
+        Global limits overridden by limits of issue labels, when several labels set the same limit the smallest one wins.
+        """
+        limits = {name: defaults.get(name, 0) for name in LIMITS}
+        tool_calls = dict(defaults.get('max_tool_calls') or {})
+
+        overrides = [label_budgets[label] for label in labels if label in label_budgets]
+        for name in LIMITS:
+            values = [x[name] for x in overrides if x.get(name)]
+            if values:
+                limits[name] = min(values)
+
+        for tool_name in {name for x in overrides for name in x.get('max_tool_calls', {})}:
+            tool_calls[tool_name] = min(x['max_tool_calls'][tool_name] for x in overrides if tool_name in x.get('max_tool_calls', {}))
+
+        return cls(max_tool_calls=tool_calls, **limits)
+
+
+    def tool_limit(self, tool_name:str) -> int:
+        return self.max_tool_calls.get(tool_name, self.max_tool_calls.get('*', 0))
+
+
+class RunUsage():
+    """
+    Usage of a running agent. Tokens and LLM calls are counted by `BudgetCallbackHandler` for every model call
+    of the run, generator tools included; tool calls and wall-clock are checked after every agent step.
+    Counts start from zero when an interrupted run is resumed.
+    """
+    def __init__(self, budget:RunBudget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.llm_calls = 0
+        self.tool_calls = Counter()
+        # first exceeded limit, raised again on the next step if a tool swallowed it
+        self.exceeded = None
+
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+    def remaining_seconds(self) -> float:
+        """
+        Seconds left for the run or None without wall-clock limit.
+        """
+        if not self.budget.max_seconds:
+            return None
+        return max(self.budget.max_seconds - self.elapsed(), 0)
+
+
+    def _exceed(self, reason:str):
+        self.exceeded = self.exceeded or BudgetExceeded(reason, self)
+        raise self.exceeded
+
+
+    def record_llm(self, usage:dict):
+        """
+        Account one model call.
+        """
+        self.llm_calls += 1
+        self.input_tokens += usage.get('input_tokens', 0)
+        self.output_tokens += usage.get('output_tokens', 0)
+        self.total_tokens += usage.get('total_tokens', 0)
+
+        if self.budget.max_tokens and self.total_tokens > self.budget.max_tokens:
+            self._exceed(f"tokens {self.total_tokens}/{self.budget.max_tokens}")
+        if self.budget.max_llm_calls and self.llm_calls > self.budget.max_llm_calls:
+            self._exceed(f"LLM calls {self.llm_calls}/{self.budget.max_llm_calls}")
+
+
+    def observe(self, chunk:dict):
+        """
+        Check agent step from the stream chunk. Tool calls requested by the model are checked
+        before the tools node runs them, so the limit is never passed.
+        """
+        if self.exceeded:
+            raise self.exceeded
+
+        for message in (chunk.get('agent') or {}).get('messages', []):
+            requested = Counter(call['name'] for call in getattr(message, 'tool_calls', None) or [])
+            for tool_name, count in requested.items():
+                limit = self.budget.tool_limit(tool_name)
+                if limit and self.tool_calls[tool_name] + count > limit:
+                    self._exceed(f"`{tool_name}` calls {self.tool_calls[tool_name] + count}/{limit}")
+            self.tool_calls.update(requested)
+
+        if self.budget.max_seconds and self.elapsed() > self.budget.max_seconds:
+            self._exceed(f"wall-clock {self.elapsed():.0f}s/{self.budget.max_seconds}s")
+
+
+    def summary(self) -> str:
+        tools = ", ".join(f"{name}: {count}" for name, count in self.tool_calls.most_common()) or "none"
+        return (
+            f"Tokens: {self.total_tokens} (input: {self.input_tokens}, output: {self.output_tokens}), "
+            f"LLM calls: {self.llm_calls}, wall-clock: {self.elapsed():.0f}s, tool calls: {tools}"
+        )
+
+
+def llm_usage(response) -> dict:
+    """
+    Token usage of LLM result: usage metadata of chat messages or `token_usage` reported by the provider.
+    """
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if metadata:
+                found = True
+                for key in usage:
+                    usage[key] += metadata.get(key, 0)
+    if found:
+        return usage
+
+    token_usage = (response.llm_output or {}).get('token_usage') or {}
+    return {
+        "input_tokens": token_usage.get('prompt_tokens', 0),
+        "output_tokens": token_usage.get('completion_tokens', 0),
+        "total_tokens": token_usage.get('total_tokens', 0),
+    }
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """
+    Counts every model call of the run, including calls of generator tools which receive the run config.
+    Raises `BudgetExceeded` right after the call that passed the limit.
+    """
+    # called in the event loop and errors are not swallowed by the callback manager
+    run_inline = True
+    raise_error = True
+
+    def __init__(self, usage:RunUsage):
+        self.usage = usage
+
+    def on_llm_end(self, response, **kwargs):
+        self.usage.record_llm(llm_usage(response))
@@ -1,9 +1,12 @@
 import re
 
 import gitlab
-from gitlab.exceptions import GitlabCreateError
+from gitlab.exceptions import GitlabCreateError, GitlabGetError
 
+from src.profiling import trace_methods
 
+
+@trace_methods("git")
 class GitWorker():
     def __init__(self, gitlab_url:str, gitlab_token:str, project_path:str):
         self.__gitlab_url = gitlab_url
@@ -58,11 +61,60 @@ class GitWorker():
                 raise e
 
         
+    def get_file_content(self, filename:str, ref:str='main') -> str:
+        """
+        File content from repository or None when the file does not exist.
+        """
+        try:
+            return self.project.files.get(file_path=filename, ref=ref).decode().decode('utf-8')
+        except GitlabGetError:
+            return None
+
+
+    def list_tree(self, path:str='', ref:str='main') -> list[dict]:
+        """
+        Files of repository folder with blob ids, blob id changes when file content changes.
+        """
+        tree = self.project.repository_tree(path=path, ref=ref, recursive=True, iterator=True)
+        return [{"path": x['path'], "id": x['id']} for x in tree if x['type'] == 'blob']
+
+
+    def branch_head(self, branch_name:str='main') -> str:
+        """
+        Commit sha the branch points to or None when the branch does not exist.
+        """
+        try:
+            return self.project.branches.get(branch_name).commit['id']
+        except GitlabGetError:
+            return None
+
+
+    def changed_paths(self, before:str, after:str) -> tuple[list[str], list[str]]:
+        """
+        Paths changed between two commits: (added or modified, removed).
+        """
+        compare = self.project.repository_compare(before, after)
+        changed, removed = [], []
+        for diff in compare['diffs']:
+            if diff['deleted_file']:
+                removed.append(diff['old_path'])
+                continue
+            if diff['renamed_file']:
+                removed.append(diff['old_path'])
+            changed.append(diff['new_path'])
+        return changed, removed
+
+
     def gitlab_commit_file(self, branch_name:str, filename:str, filecontent:str, task:str):
     
+            # commit is repeated when interrupted run is resumed, same file is not committed twice
+            existing = self.get_file_content(filename, ref=branch_name)
+            if existing == filecontent:
+                return {"task": task, "success": True, "commit": None, "skipped": "file already committed"}
+
             actions = [
                 {
-                    'action': 'create',
+                    'action': 'create' if existing is None else 'update',
                     'file_path': f'{filename}',
                     'content': filecontent
                 }
@@ -78,25 +130,69 @@ class GitWorker():
             except Exception as e:
                 return {"task": task, "success": False}
             
+    def list_open_issues(self, labels:list[str]=None, per_page:int=50):
+        """
+        Iterate over open issues page by page, optionally filtered by labels (all labels must match).
+        """
+        return self.project.issues.list(state='opened', labels=labels or None, per_page=per_page, iterator=True)
+
+
+    def issue_payload(self, issue) -> dict:
+        """
+        Build webhook-like payload for the issue, same shape as GitLab issue hook.
+        """
+        return {
+            "object_kind": "issue",
+            "project": {"id": self.project_id},
+            "object_attributes": {
+                "id": issue.id,
+                # issue is addressed by iid in the project API and agent threads
+                "iid": issue.iid,
+                "title": issue.title,
+                "description": issue.description,
+                "labels": issue.labels,
+                "action": "open",
+            },
+        }
+
+    def push_branch(self, branch_name:str) -> bool:
+        """
+        Files are committed through API right away, nothing to push.
+        """
+        return False
+
+
     def add_notes(self, issue_id, message):
         issue = self.project.issues.get(issue_id)
         issue.notes.create({"body": message})
 
 
+    def add_labels(self, issue_id, labels:list[str]):
+        issue = self.project.issues.get(issue_id)
+        issue.labels = list(dict.fromkeys(issue.labels + labels))
+        issue.save()
+
+
     def close_issue(self, issue_id):
         issue = self.project.issues.get(issue_id)
         issue.state_event = 'close'
         issue.save()
 
 
-    def create_merge_request(self, issue_id) -> bool:
-
+    def create_merge_request(self, issue_id, branch_name:str=None) -> bool:
+        """
+        Merge request of the issue branch, by default the branch name is built from the current issue title.
+        """
         issue = self.project.issues.get(issue_id)
         title = issue.title
 
-        branch_name = self.gitlab_branch_name(issue_id, title)
+        branch_name = branch_name or self.gitlab_branch_name(issue_id, title)
         branch = self.project.branches.get(branch_name)
         if branch:
+            if self.project.mergerequests.list(source_branch=branch_name, state='opened', get_all=False):
+                # merge request was created before the run was interrupted
+                return True
+
             data = {
                 'source_branch': branch_name,
                 'target_branch': 'main',
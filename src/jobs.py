@@ -0,0 +1,191 @@
+import json
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from src.scheduler import PRIORITY_CLASSES
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'issue',
+    project_id TEXT,
+    issue_id TEXT,
+    priority SMALLINT NOT NULL DEFAULT 1,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS agent_jobs_ready ON agent_jobs (status, priority, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS agent_jobs_active ON agent_jobs (kind, project_id, issue_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS agent_jobs_issue ON agent_jobs (project_id, issue_id) WHERE status = 'running';
+"""
+
+ENQUEUE = """
+INSERT INTO agent_jobs (kind, project_id, issue_id, priority, payload)
+VALUES (%(kind)s, %(project_id)s, %(issue_id)s, %(priority)s, %(payload)s)
+ON CONFLICT (kind, project_id, issue_id) WHERE status IN ('queued', 'running') DO NOTHING
+RETURNING id
+"""
+
+# Jobs with expired lease are taken over by another worker until attempts are exhausted
+EXPIRE = """
+UPDATE agent_jobs SET status = 'failed', finished_at = now(), error = 'lease expired, attempts exhausted'
+WHERE status = 'running' AND lease_expires_at < now() AND attempts >= %(max_attempts)s
+"""
+
+# Claims are serialized: the project quota and the check of running jobs of the issue below
+# read rows other claimers may be updating, SKIP LOCKED alone lets two workers pass them at once
+CLAIM_LOCK = """
+SELECT pg_advisory_xact_lock(%(key)s)
+"""
+
+CLAIM_LOCK_KEY = 0x61676a6f62
+
+# Jobs of one issue (full run and description updates) never run at the same time,
+# an update queued during the full run waits for it and then sees its manifest
+CLAIM = """
+WITH running AS (
+    SELECT project_id, count(*) AS n FROM agent_jobs
+    WHERE status = 'running' AND lease_expires_at > now()
+    GROUP BY project_id
+), candidate AS (
+    SELECT j.id FROM agent_jobs j
+    LEFT JOIN running r ON r.project_id = j.project_id
+    WHERE (j.status = 'queued' OR (j.status = 'running' AND j.lease_expires_at < now()))
+      AND j.attempts < %(max_attempts)s
+      AND coalesce(r.n, 0) < %(project_quota)s
+      AND NOT EXISTS (
+          SELECT 1 FROM agent_jobs a
+          WHERE a.project_id = j.project_id AND a.issue_id = j.issue_id AND a.id <> j.id
+            AND a.status = 'running' AND a.lease_expires_at > now()
+      )
+    ORDER BY j.priority, coalesce(r.n, 0), j.created_at
+    LIMIT 1
+    FOR UPDATE OF j SKIP LOCKED
+)
+UPDATE agent_jobs SET
+    status = 'running',
+    attempts = agent_jobs.attempts + 1,
+    lease_owner = %(owner)s,
+    lease_expires_at = now() + make_interval(secs => %(lease)s),
+    started_at = now()
+FROM candidate WHERE agent_jobs.id = candidate.id
+RETURNING agent_jobs.*
+"""
+
+HEARTBEAT = """
+UPDATE agent_jobs SET lease_expires_at = now() + make_interval(secs => %(lease)s)
+WHERE id = %(id)s AND lease_owner = %(owner)s AND status = 'running'
+RETURNING id
+"""
+
+COMPLETE = """
+UPDATE agent_jobs SET status = 'done', finished_at = now(), error = NULL
+WHERE id = %(id)s AND lease_owner = %(owner)s
+"""
+
+FAIL = """
+UPDATE agent_jobs SET
+    status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'queued' END,
+    finished_at = CASE WHEN attempts >= %(max_attempts)s THEN now() END,
+    lease_owner = NULL,
+    lease_expires_at = NULL,
+    error = %(error)s
+WHERE id = %(id)s AND lease_owner = %(owner)s
+"""
+
+STATS = """
+SELECT status, priority, count(*) AS jobs, extract(epoch FROM max(now() - created_at)) AS oldest
+FROM agent_jobs WHERE status IN ('queued', 'running')
+GROUP BY status, priority
+"""
+
+
+class JobQueue():
+    """
+    Shared Postgres queue of agent runs.
+    API process only enqueues, workers claim jobs with a lease and keep it with heartbeats.
+    """
+    def __init__(self, pg_url:str, lease:int=120, max_attempts:int=3, project_quota:int=2, pool_size:int=4):
+        self.pg_url = pg_url
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.project_quota = project_quota
+        self.pool = AsyncConnectionPool(pg_url, min_size=1, max_size=pool_size, open=False, kwargs={"autocommit": True, "row_factory": dict_row})
+
+    @classmethod
+    async def create(cls, pg_url:str, **kwargs):
+        queue = cls(pg_url, **kwargs)
+        await queue.pool.open()
+        async with queue.pool.connection() as conn:
+            await conn.execute(SCHEMA)
+        return queue
+
+
+    async def close(self):
+        await self.pool.close()
+
+
+    async def enqueue(self, payload:dict, kind:str='issue', priority:str='normal', project_id=None, issue_id=None) -> int:
+        """
+        Add job to the queue, returns job id or None when the same issue is already queued or running.
+        """
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(ENQUEUE, {
+                "kind": kind,
+                "project_id": str(project_id),
+                "issue_id": str(issue_id),
+                "priority": PRIORITY_CLASSES.index(priority) if priority in PRIORITY_CLASSES else 1,
+                "payload": json.dumps(payload, ensure_ascii=False),
+            })
+            row = await cur.fetchone()
+            return row["id"] if row else None
+
+
+    async def claim(self, owner:str) -> dict:
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                # released on commit, the next claimer sees the job taken by this one
+                await conn.execute(CLAIM_LOCK, {"key": CLAIM_LOCK_KEY})
+                await conn.execute(EXPIRE, {"max_attempts": self.max_attempts})
+                cur = await conn.execute(CLAIM, {
+                    "owner": owner,
+                    "lease": self.lease,
+                    "max_attempts": self.max_attempts,
+                    "project_quota": self.project_quota
+                })
+                return await cur.fetchone()
+
+
+    async def heartbeat(self, job_id:int, owner:str) -> bool:
+        """
+        Extend job lease, False means the lease was lost and the job belongs to another worker now.
+        """
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(HEARTBEAT, {"id": job_id, "owner": owner, "lease": self.lease})
+            return await cur.fetchone() is not None
+
+
+    async def complete(self, job_id:int, owner:str):
+        async with self.pool.connection() as conn:
+            await conn.execute(COMPLETE, {"id": job_id, "owner": owner})
+
+
+    async def fail(self, job_id:int, owner:str, error:str):
+        async with self.pool.connection() as conn:
+            await conn.execute(FAIL, {"id": job_id, "owner": owner, "error": error[:2000], "max_attempts": self.max_attempts})
+
+
+    async def stats(self) -> list[dict]:
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(STATS)
+            rows = await cur.fetchall()
+            return [{**row, "priority": PRIORITY_CLASSES[row["priority"]]} for row in rows]
@@ -0,0 +1,320 @@
+import os
+import re
+import time
+import base64
+import logging
+import tempfile
+import threading
+import subprocess
+
+from urllib.parse import urlsplit
+
+from gitlab.exceptions import GitlabCreateError
+
+from src.gitwork import GitWorker
+from src.profiling import trace_methods
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitCommandError(Exception):
+    pass
+
+
+class LocalRepository():
+    """
+    Shallow, sparse, blobless clone of the target project.
+    Reads are served from disk, commits are built with git plumbing (no worktree per branch)
+    and all local commits of a branch are sent with a single `git push`.
+    `auth_header` is passed to every git command through the environment, so credentials
+    are never written to `.git/config` and do not appear in git error messages.
+    """
+    def __init__(self, remote_url:str, workdir:str=None, default_branch:str='main', sparse_paths:list[str]=None,
+                 fetch_interval:int=60, author_name:str='gitlab-agent', author_email:str='gitlab-agent@localhost', auth_header:str=None):
+        self.remote_url = remote_url
+        self.auth_header = auth_header
+        self.workdir = workdir or tempfile.mkdtemp(prefix="gitlab-agent-repo-")
+        self.path = os.path.join(self.workdir, "repo")
+        self.default_branch = default_branch
+        self.sparse_paths = sparse_paths or ['dags']
+        self.fetch_interval = fetch_interval
+        self.author_name = author_name
+        self.author_email = author_email
+
+        self.fetched_at = 0.0
+        self.unpushed = set()
+        self._lock = threading.RLock()
+
+        os.makedirs(self.workdir, exist_ok=True)
+        self._clone()
+
+
+    def _git(self, *args, input:str=None, env:dict=None, check:bool=True) -> str:
+        # same as `-c http.extraHeader=...`, but not visible in the process list
+        auth = {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "http.extraHeader", "GIT_CONFIG_VALUE_0": self.auth_header} if self.auth_header else {}
+        res = subprocess.run(
+            ["git", "-c", f"user.name={self.author_name}", "-c", f"user.email={self.author_email}", *args],
+            cwd=self.path if os.path.isdir(self.path) else self.workdir,
+            input=input.encode('utf-8') if input is not None else None,
+            env={**os.environ, **auth, **(env or {})},
+            capture_output=True,
+        )
+        if check and res.returncode != 0:
+            raise GitCommandError(f"git {args[0]} failed: {res.stderr.decode('utf-8', 'replace').strip()}")
+        return res.stdout.decode('utf-8') if res.returncode == 0 else None
+
+
+    def _clone(self):
+        if os.path.isdir(os.path.join(self.path, ".git")):
+            # clones made by older versions kept the token in the origin url
+            self._git("remote", "set-url", "origin", self.remote_url)
+            self.refresh(force=True)
+            return
+
+        self._git("clone", "--depth", "1", "--filter=blob:none", "--sparse", "--branch", self.default_branch, self.remote_url, self.path)
+        self._git("sparse-checkout", "set", *self.sparse_paths)
+        self.fetched_at = time.monotonic()
+
+
+    def refresh(self, force:bool=False):
+        """
+        Incremental shallow fetch of the default branch, at most once per `fetch_interval` seconds.
+        """
+        with self._lock:
+            if not force and time.monotonic() - self.fetched_at < self.fetch_interval:
+                return
+            self._git("fetch", "--depth", "1", "origin", self.default_branch)
+            self._git("checkout", "-B", self.default_branch, f"origin/{self.default_branch}")
+            self.fetched_at = time.monotonic()
+
+
+    def _rev(self, ref:str) -> str:
+        return f"origin/{self.default_branch}" if ref == self.default_branch else f"refs/heads/{ref}"
+
+
+    def has_branch(self, branch_name:str) -> bool:
+        return self._git("rev-parse", "--verify", "--quiet", f"refs/heads/{branch_name}", check=False) is not None
+
+
+    def ensure_branch(self, branch_name:str) -> bool:
+        """
+        Make branch available locally: fetch it when it exists in remote. Returns False for unknown branch.
+        """
+        with self._lock:
+            if self.has_branch(branch_name):
+                return True
+            if not self._git("ls-remote", "--heads", "origin", branch_name).strip():
+                return False
+            self._git("fetch", "--depth", "1", "origin", f"+refs/heads/{branch_name}:refs/heads/{branch_name}")
+            return True
+
+
+    def create_branch(self, branch_name:str) -> str:
+        with self._lock:
+            if not self.ensure_branch(branch_name):
+                self.refresh()
+                self._git("branch", branch_name, f"origin/{self.default_branch}")
+            return branch_name
+
+
+    def read(self, filename:str, ref:str=None) -> str:
+        """
+        File content or None. Default branch files inside sparse paths are read from disk.
+        """
+        ref = ref or self.default_branch
+        filename = filename.lstrip('/')
+        with self._lock:
+            if ref == self.default_branch:
+                self.refresh()
+                local_path = os.path.join(self.path, filename)
+                if os.path.isfile(local_path):
+                    with open(local_path, "r", encoding="utf-8") as f:
+                        return f.read()
+            elif not self.ensure_branch(ref):
+                return None
+
+            # files outside sparse paths are fetched on demand from the promisor remote
+            return self._git("show", f"{self._rev(ref)}:{filename}", check=False)
+
+
+    def list_tree(self, path:str='', ref:str=None) -> list[dict]:
+        ref = ref or self.default_branch
+        with self._lock:
+            if ref == self.default_branch:
+                self.refresh()
+            elif not self.ensure_branch(ref):
+                return []
+
+            out = self._git("ls-tree", "-r", self._rev(ref), "--", path) if path else self._git("ls-tree", "-r", self._rev(ref))
+            files = []
+            for line in out.splitlines():
+                meta, file_path = line.split("\t", 1)
+                _, kind, blob_id = meta.split()
+                if kind == "blob":
+                    files.append({"path": file_path, "id": blob_id})
+            return files
+
+
+    def changed_paths(self, before:str, after:str) -> tuple[list[str], list[str]]:
+        with self._lock:
+            self._git("fetch", "--depth", "1", "origin", before, after)
+            changed, removed = [], []
+            for line in self._git("diff", "--name-status", "-M", before, after).splitlines():
+                status, *paths = line.split("\t")
+                if status.startswith("D"):
+                    removed.append(paths[0])
+                elif status.startswith("R"):
+                    removed.append(paths[0])
+                    changed.append(paths[1])
+                else:
+                    changed.append(paths[-1])
+            return changed, removed
+
+
+    def commit_file(self, branch_name:str, filename:str, filecontent:str, message:str) -> str:
+        """
+        Commit one file to local branch without checkout, returns commit sha.
+        """
+        filename = filename.lstrip('/')
+        with self._lock:
+            parent = self._git("rev-parse", f"refs/heads/{branch_name}").strip()
+            blob_id = self._git("hash-object", "-w", "--stdin", input=filecontent).strip()
+
+            # temporary index keeps the main worktree index untouched
+            index_file = os.path.join(self.workdir, "index-" + re.sub(r'\W+', '-', branch_name))
+            env = {"GIT_INDEX_FILE": index_file}
+            try:
+                self._git("read-tree", parent, env=env)
+                self._git("update-index", "--add", "--cacheinfo", f"100644,{blob_id},{filename}", env=env)
+                tree = self._git("write-tree", env=env).strip()
+            finally:
+                if os.path.exists(index_file):
+                    os.remove(index_file)
+
+            commit = self._git("commit-tree", tree, "-p", parent, "-m", message).strip()
+            self._git("update-ref", f"refs/heads/{branch_name}", commit, parent)
+            self.unpushed.add(branch_name)
+            return commit
+
+
+    def drop_branch(self, branch_name:str):
+        """
+        Forget local branch with its unpushed commits, the remote branch is fetched again on the next use.
+        """
+        with self._lock:
+            self._git("update-ref", "-d", f"refs/heads/{branch_name}", check=False)
+            self.unpushed.discard(branch_name)
+
+
+    def push(self, branch_name:str) -> bool:
+        """
+        Push all local commits of the branch in one operation.
+        """
+        with self._lock:
+            if branch_name not in self.unpushed:
+                return False
+            self._git("push", "origin", f"refs/heads/{branch_name}:refs/heads/{branch_name}")
+            self.unpushed.discard(branch_name)
+            return True
+
+
+def auth_header(token:str) -> str:
+    """
+    HTTP header for git over HTTPS with GitLab access token.
+    """
+    credentials = base64.b64encode(f"oauth2:{token}".encode('utf-8')).decode('ascii')
+    return f"Authorization: Basic {credentials}"
+
+
+@trace_methods("git")
+class LocalGitWorker(GitWorker):
+    """
+    GitWorker with repository files served by a local clone.
+    Issues, notes and merge requests still go through GitLab API. Generated files are committed locally
+    and pushed before the commit tool returns, so a checkpointed commit is never lost with the worker.
+    When local commit or push fails (e.g. the branch was changed in remote) the file is committed through the API.
+    """
+    def __init__(self, gitlab_url:str, gitlab_token:str, project_path:str, workdir:str=None, sparse_paths:list[str]=None, fetch_interval:int=60):
+        super().__init__(gitlab_url, gitlab_token, project_path)
+        self.gl.auth()
+
+        self.repo = LocalRepository(
+            remote_url=self.project.http_url_to_repo,
+            workdir=workdir,
+            default_branch=self.project.default_branch or 'main',
+            sparse_paths=sparse_paths,
+            fetch_interval=fetch_interval,
+            author_name=self.gl.user.name,
+            author_email=getattr(self.gl.user, 'email', None) or f"{self.gl.user.username}@{urlsplit(gitlab_url).hostname}",
+            auth_header=auth_header(gitlab_token),
+        )
+
+
+    def gitlab_create_branch(self, issue_id:int, task_title:str) -> str:
+        return self.repo.create_branch(self.gitlab_branch_name(issue_id, task_title))
+
+
+    def get_file_content(self, filename:str, ref:str='main') -> str:
+        try:
+            return self.repo.read(filename, ref=ref)
+        except GitCommandError as e:
+            logger.warning("Local read failed, using GitLab API: %s", e)
+            return super().get_file_content(filename, ref=ref)
+
+
+    def list_tree(self, path:str='', ref:str='main') -> list[dict]:
+        return self.repo.list_tree(path, ref=ref)
+
+
+    def changed_paths(self, before:str, after:str) -> tuple[list[str], list[str]]:
+        try:
+            return self.repo.changed_paths(before, after)
+        except GitCommandError as e:
+            logger.warning("Local diff failed, using GitLab API: %s", e)
+            return super().changed_paths(before, after)
+
+
+    def gitlab_commit_file(self, branch_name:str, filename:str, filecontent:str, task:str):
+        try:
+            if not self.repo.ensure_branch(branch_name):
+                self.repo.create_branch(branch_name)
+
+            if self.repo.read(filename, ref=branch_name) == filecontent:
+                return {"task": task, "success": True, "commit": None, "skipped": "file already committed"}
+
+            commit = self.repo.commit_file(branch_name, filename, filecontent, task)
+            # tool result is checkpointed after return, the commit must already be in remote
+            self.repo.push(branch_name)
+            return {"task": task, "success": True, "commit": commit}
+        except GitCommandError as e:
+            logger.warning("Local commit failed, using GitLab API: %s", e)
+            return self._api_commit_file(branch_name, filename, filecontent, task)
+
+
+    def _api_commit_file(self, branch_name:str, filename:str, filecontent:str, task:str):
+        self.repo.drop_branch(branch_name)
+        try:
+            self.project.branches.create({'branch': branch_name, 'ref': self.repo.default_branch})
+        except GitlabCreateError:
+            # branch already exists in remote
+            pass
+        return super().gitlab_commit_file(branch_name, filename, filecontent, task)
+
+
+    def push_branch(self, branch_name:str) -> bool:
+        try:
+            return self.repo.push(branch_name)
+        except GitCommandError as e:
+            logger.warning("Push failed, dropping local commits of %s: %s", branch_name, e)
+            self.repo.drop_branch(branch_name)
+            return False
+
+
+    def create_merge_request(self, issue_id, branch_name:str=None) -> bool:
+        if branch_name is None:
+            issue = self.project.issues.get(issue_id)
+            branch_name = self.gitlab_branch_name(issue_id, issue.title)
+        self.push_branch(branch_name)
+
+        return super().create_merge_request(issue_id, branch_name=branch_name)
@@ -0,0 +1,152 @@
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import hashlib
+
+from uuid import uuid4
+from datetime import datetime, timezone
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Fields of the current run added to every log record: run_id, issue_id, job_id
+run_context: ContextVar[dict] = ContextVar('run_context', default={})
+
+# LogRecord attributes, everything else in record is an extra field
+RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', None, None).__dict__) | {'message', 'asctime', 'taskName'}
+
+_listener: QueueListener = None
+
+
+def bind(**fields):
+    """
+    Add fields to the log context of the current task, asyncio tasks created later inherit them.
+    """
+    return run_context.set({**run_context.get(), **fields})
+
+
+def start_run(**fields) -> str:
+    """
+    Bind correlation id of the run unless the task already runs inside one, returns run id.
+    """
+    run_id = run_context.get().get('run_id') or uuid4().hex[:12]
+    bind(run_id=run_id, **fields)
+    return run_id
+
+
+def sampled(key:str, rate:float) -> bool:
+    """
+    Stable sampling decision by key: the same run is always sampled or not, also after resume.
+    """
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return int(hashlib.sha256(str(key).encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF < rate
+
+
+def truncate(value, max_length:int):
+    if isinstance(value, str):
+        return value if len(value) <= max_length else f"{value[:max_length]}... [{len(value) - max_length} chars truncated]"
+    if isinstance(value, dict):
+        return {str(k): truncate(v, max_length) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate(x, max_length) for x in value]
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return truncate(repr(value), max_length)
+
+
+class RunContextFilter(logging.Filter):
+    """
+    Copies run context to the record in the calling task, before it goes to the queue.
+    Debug records of runs out of sample are dropped.
+    """
+    def __init__(self, debug_sample_rate:float=1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record:logging.LogRecord) -> bool:
+        context = run_context.get()
+        for key, value in context.items():
+            setattr(record, key, value)
+        if record.levelno <= logging.DEBUG:
+            return sampled(context.get('run_id', ''), self.debug_sample_rate)
+        return True
+
+
+class RunQueueHandler(QueueHandler):
+    """
+    Only resolves the message and traceback in the calling thread, the record is formatted to JSON by the listener.
+    """
+    def prepare(self, record:logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, string values longer than `max_length` are truncated.
+    """
+    def __init__(self, max_length:int=2000):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record:logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), self.max_length),
+        }
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                entry[key] = truncate(value, self.max_length)
+
+        return json.dumps(entry, ensure_ascii=False, default=repr)
+
+
+def setup_logging(level:str='INFO', max_length:int=2000, debug_sample_rate:float=1.0):
+    """
+    Root logger writes to a queue, JSON formatting and stdout writes happen in the listener thread
+    and do not block the event loop. Repeated calls are ignored.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter(max_length=max_length))
+
+    handler = RunQueueHandler(log_queue)
+    handler.addFilter(RunContextFilter(debug_sample_rate=debug_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flush queued records, called on shutdown.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,56 @@
+import hashlib
+
+
+# Issue parameters each kind of generated file depends on, `None` means all parameters
+ARTIFACT_INPUTS = {
+    "dag": ["source_database", "source_table", "interval", "target_table", "target_storing_type", "capture_changes_column", "data_quality"],
+    "task": ["source_database", "source_table", "source_table_ddl", "required_transformations", "target_table", "target_storing_type", "capture_changes_column"],
+    "ddl": ["source_table_ddl", "target_table", "target_storing_type", "capture_changes_column"],
+    "dq": ["source_table_ddl", "target_table", "data_quality"],
+    "doc": None,
+}
+
+
+def field_digests(fields:dict[str, str]) -> dict[str, str]:
+    """
+    Digest per issue parameter, manifest does not keep values (source_database may contain credentials).
+    """
+    return {name: hashlib.sha256(value.encode('utf-8')).hexdigest()[:16] for name, value in fields.items()}
+
+
+def changed_fields(old:dict[str, str], new:dict[str, str]) -> list[str]:
+    return sorted(name for name in set(old) | set(new) if old.get(name) != new.get(name))
+
+
+def build_manifest(issue_id, branch_name:str, fields:dict[str, str], artifacts:list[dict], manifest:dict=None) -> dict:
+    """
+    New manifest with committed artifacts, artifacts of the previous manifest not regenerated in this run are kept.
+    """
+    manifest = manifest or {"issue_id": issue_id, "artifacts": {}}
+    manifest["branch_name"] = branch_name
+    manifest["fields"] = field_digests(fields)
+
+    for meta in artifacts:
+        manifest["artifacts"][meta["filename"]] = {
+            "kind": meta["kind"],
+            "fields": manifest["fields"],
+        }
+
+    return manifest
+
+
+def stale_artifacts(manifest:dict, fields:dict[str, str]) -> dict[str, list[str]]:
+    """
+    Generated files to regenerate for new issue parameters: file name to changed parameters it depends on.
+    """
+    digests = field_digests(fields)
+    stale = {}
+    for filename, artifact in manifest.get("artifacts", {}).items():
+        changed = changed_fields(artifact["fields"], digests)
+        depends = ARTIFACT_INPUTS.get(artifact["kind"])
+        if depends is not None:
+            changed = [name for name in changed if name in depends]
+        if changed:
+            stale[filename] = changed
+
+    return stale
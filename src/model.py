@@ -15,9 +15,87 @@ class AppConfig(BaseSettings):
     PROJECT_PATH: str = Field(..., min_length=1, env="PROJECT_PATH")
     
     # Optional variables with defaults
-    LOG_LEVEL: str = Field('INFO', env="DEBUG")
+    LOG_LEVEL: str = Field('INFO', env="LOG_LEVEL")
     POSTGRESQL_URL: str = Field(None, env="POSTGRESQL_URL")
 
+    # Generator tools output mode
+    STRUCTURED_OUTPUT: bool = Field(True, env="STRUCTURED_OUTPUT")
+    STRUCTURED_OUTPUT_METHOD: str = Field('function_calling', env="STRUCTURED_OUTPUT_METHOD")
+
+    # Folder for generated files, temporary folder is used by default.
+    # Required with Postgres checkpoints or JOB_QUEUE: resumed runs reference files staged before the restart
+    ARTIFACTS_FOLDER: Optional[str] = Field(None, env="ARTIFACTS_FOLDER")
+
+    # Cache TTL in seconds for MCP schema lookups, 0 disables cache
+    MCP_CACHE_TTL: int = Field(600, env="MCP_CACHE_TTL")
+
+    # Issue runs scheduling
+    SCHEDULER_MAX_CONCURRENCY: int = Field(4, env="SCHEDULER_MAX_CONCURRENCY")
+    SCHEDULER_PROJECT_QUOTA: int = Field(2, env="SCHEDULER_PROJECT_QUOTA")
+    # JSON object with project id to weight, e.g. {"1": 2.0}
+    SCHEDULER_PROJECT_WEIGHTS: str = Field('{}', env="SCHEDULER_PROJECT_WEIGHTS")
+
+    # Shared Postgres job queue, API only enqueues and `python -m src.worker` replicas run the agent
+    JOB_QUEUE: bool = Field(False, env="JOB_QUEUE")
+    JOB_LEASE_SECONDS: int = Field(120, env="JOB_LEASE_SECONDS")
+    JOB_HEARTBEAT_SECONDS: int = Field(30, env="JOB_HEARTBEAT_SECONDS")
+    JOB_MAX_ATTEMPTS: int = Field(3, env="JOB_MAX_ATTEMPTS")
+    WORKER_CONCURRENCY: int = Field(2, env="WORKER_CONCURRENCY")
+
+    # Local index of project DAGs, tasks and DDL used as generator templates
+    TEMPLATE_INDEX_FOLDER: Optional[str] = Field(None, env="TEMPLATE_INDEX_FOLDER")
+    TEMPLATE_INDEX_ROOT: str = Field('dags', env="TEMPLATE_INDEX_ROOT")
+    TEMPLATE_INDEX_MAX_AGE: int = Field(600, env="TEMPLATE_INDEX_MAX_AGE")
+
+    # Repository files backend: `api` (GitLab API per file) or `local` (sparse clone, one push per branch)
+    GIT_BACKEND: str = Field('api', env="GIT_BACKEND")
+    GIT_WORKDIR: Optional[str] = Field(None, env="GIT_WORKDIR")
+    # Comma separated folders checked out in the local clone, other files are fetched on demand
+    GIT_SPARSE_PATHS: str = Field('dags', env="GIT_SPARSE_PATHS")
+    GIT_FETCH_INTERVAL: int = Field(60, env="GIT_FETCH_INTERVAL")
+
+    # Structured JSON logs, DEBUG records (agent step contents) are kept for LOG_DEBUG_SAMPLE_RATE of runs
+    LOG_MAX_FIELD_LENGTH: int = Field(2000, env="LOG_MAX_FIELD_LENGTH")
+    LOG_DEBUG_SAMPLE_RATE: float = Field(1.0, env="LOG_DEBUG_SAMPLE_RATE")
+
+    # Langfuse tracing, enabled when host and both keys are set; LANGFUSE_SAMPLE_RATE of runs are traced, spans are exported in batches
+    LANGFUSE_ENABLED: bool = Field(True, env="LANGFUSE_ENABLED")
+    LANGFUSE_PUBLIC_KEY: Optional[str] = Field(None, env="LANGFUSE_PUBLIC_KEY")
+    LANGFUSE_SECRET_KEY: Optional[str] = Field(None, env="LANGFUSE_SECRET_KEY")
+    LANGFUSE_HOST: Optional[str] = Field(None, env="LANGFUSE_HOST")
+    LANGFUSE_SAMPLE_RATE: float = Field(1.0, env="LANGFUSE_SAMPLE_RATE")
+    LANGFUSE_FLUSH_AT: int = Field(50, env="LANGFUSE_FLUSH_AT")
+    LANGFUSE_FLUSH_INTERVAL: float = Field(5.0, env="LANGFUSE_FLUSH_INTERVAL")
+
+    # Admin endpoints (/admin/*) are disabled without token
+    ADMIN_TOKEN: Optional[str] = Field(None, env="ADMIN_TOKEN")
+    # On-demand sampling profiles and event loop stalls longer than LOOP_STALL_THRESHOLD_MS (0 disables watchdog)
+    PROFILE_FOLDER: Optional[str] = Field(None, env="PROFILE_FOLDER")
+    PROFILE_INTERVAL_MS: int = Field(10, env="PROFILE_INTERVAL_MS")
+    PROFILE_MAX_SECONDS: int = Field(300, env="PROFILE_MAX_SECONDS")
+    LOOP_STALL_THRESHOLD_MS: int = Field(200, env="LOOP_STALL_THRESHOLD_MS")
+
+    # Webhook admission: secret token (X-Gitlab-Token), body size and rate per source (requests per second, burst)
+    WEBHOOK_SECRET: Optional[str] = Field(None, env="WEBHOOK_SECRET")
+    WEBHOOK_MAX_BODY_BYTES: int = Field(1048576, env="WEBHOOK_MAX_BODY_BYTES")
+    WEBHOOK_RATE: float = Field(1.0, env="WEBHOOK_RATE")
+    WEBHOOK_BURST: int = Field(20, env="WEBHOOK_BURST")
+    # Load shedding with 503 and Retry-After, 0 disables a check.
+    # Accepted runs are running and waiting in the in-process scheduler, not checked with JOB_QUEUE
+    ADMISSION_MAX_ACCEPTED_RUNS: int = Field(100, env="ADMISSION_MAX_ACCEPTED_RUNS")
+    ADMISSION_MAX_MEMORY_MB: int = Field(0, env="ADMISSION_MAX_MEMORY_MB")
+    ADMISSION_MAX_LOOP_LAG_MS: int = Field(1000, env="ADMISSION_MAX_LOOP_LAG_MS")
+    ADMISSION_RETRY_AFTER: int = Field(30, env="ADMISSION_RETRY_AFTER")
+
+    # Per-issue run budgets, 0 means unlimited
+    RUN_MAX_TOKENS: int = Field(0, env="RUN_MAX_TOKENS")
+    RUN_MAX_SECONDS: int = Field(1800, env="RUN_MAX_SECONDS")
+    RUN_MAX_LLM_CALLS: int = Field(0, env="RUN_MAX_LLM_CALLS")
+    # JSON object with tool name to max calls, `*` for other tools, e.g. {"*": 10, "get_db_table_sample": 3}
+    RUN_MAX_TOOL_CALLS: str = Field('{}', env="RUN_MAX_TOOL_CALLS")
+    # JSON object with issue label to budget, e.g. {"sandbox": {"max_tokens": 100000, "max_tool_calls": {"*": 5}}}
+    RUN_BUDGET_LABELS: str = Field('{}', env="RUN_BUDGET_LABELS")
+
     class Config:
         # Extra configuration
         env_file = ".env"  # Optional: load from .env file
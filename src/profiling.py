@@ -0,0 +1,416 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import logging
+import tempfile
+import functools
+import threading
+
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.logs import run_context
+
+
+logger = logging.getLogger(__name__)
+
+# Names of spans the current task is inside, outer first
+active_spans: ContextVar[tuple] = ContextVar('active_spans', default=())
+
+# Span timings of the last runs
+MAX_RUNS = 100
+MAX_STACK_DEPTH = 128
+# Half-life of the recent event loop lag peak, seconds
+LAG_HALF_LIFE = 5.0
+
+
+class SpanStats():
+    """
+    Count, total and max duration per span name, for the process and per run.
+    """
+    def __init__(self):
+        self.process = {}
+        self.runs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _add(stats:dict, name:str, duration:float):
+        entry = stats.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += duration
+        entry["max"] = max(entry["max"], duration)
+
+    def record(self, name:str, duration:float, run_id:str=None):
+        with self._lock:
+            self._add(self.process, name, duration)
+            if run_id:
+                self.runs.setdefault(run_id, {})
+                self.runs.move_to_end(run_id)
+                self._add(self.runs[run_id], name, duration)
+                while len(self.runs) > MAX_RUNS:
+                    self.runs.popitem(last=False)
+
+    def snapshot(self, run_id:str=None) -> dict:
+        with self._lock:
+            stats = self.runs.get(run_id, {}) if run_id else self.process
+            return {name: {**entry, "total": round(entry["total"], 3), "max": round(entry["max"], 3)} for name, entry in stats.items()}
+
+
+spans = SpanStats()
+
+
+def span(name:str):
+    """
+    Decorator timing sync or async function as a span. Nested calls of a span already active
+    in the task (e.g. overridden method calling super) are counted once.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                current = active_spans.get()
+                if name in current:
+                    return await func(*args, **kwargs)
+                token = active_spans.set(current + (name,))
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    spans.record(name, time.perf_counter() - started, run_context.get().get('run_id'))
+                    active_spans.reset(token)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                current = active_spans.get()
+                if name in current:
+                    return func(*args, **kwargs)
+                token = active_spans.set(current + (name,))
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    spans.record(name, time.perf_counter() - started, run_context.get().get('run_id'))
+                    active_spans.reset(token)
+        return wrapper
+    return decorator
+
+
+def trace_methods(prefix:str):
+    """
+    Class decorator: every public method defined in the class becomes a span `<prefix>.<method>`.
+    """
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if inspect.isfunction(value) and not attr.startswith('_'):
+                setattr(cls, attr, span(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def trace_object(obj, prefix:str, methods:list[str]):
+    """
+    Wrap methods of an instance as spans, for objects of library classes (e.g. checkpointer).
+    """
+    for attr in methods:
+        setattr(obj, attr, span(f"{prefix}.{attr}")(getattr(obj, attr)))
+    return obj
+
+
+class SpanCallbackHandler(BaseCallbackHandler):
+    """
+    LLM calls made by LangGraph as `llm` spans.
+    """
+    # called in the event loop, not in executor
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            spans.record("llm", time.perf_counter() - started, run_context.get().get('run_id'))
+
+
+def frame_stack(frame) -> list[str]:
+    """
+    Frames of the stack from the outermost to the current one.
+    """
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def loop_task_context(loop:asyncio.AbstractEventLoop) -> dict:
+    """
+    Run context and active spans of the task the loop is running right now, read from another thread.
+    """
+    # public API reading the loop's current task, safe to call with an explicit loop from another thread
+    task = asyncio.current_task(loop)
+    if task is None:
+        return None
+    context = task.get_context()
+    return {"run": context.get(run_context, {}), "spans": context.get(active_spans, ())}
+
+
+class ProfileSession():
+    """
+    Sampling profiler thread: stacks of all threads (or only the loop thread running tasks of one run)
+    every `interval` seconds. Active spans of the task are added as the outer frames, so the profile shows
+    where time goes between LLM, MCP, GitLab and the checkpointer.
+    """
+    def __init__(self, loop:asyncio.AbstractEventLoop, loop_thread_id:int, path:str, interval:float=0.01, duration:float=60, issue_id=None):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.path = path
+        self.interval = interval
+        self.duration = duration
+        self.issue_id = issue_id
+        self.samples = {}
+        self.started_at = None
+        self.finished_at = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        return self.path
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _sample(self):
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+
+            prefix = []
+            if thread_id == self.loop_thread_id:
+                task = loop_task_context(self.loop)
+                if self.issue_id is not None and (task is None or str(task["run"].get("issue_id")) != str(self.issue_id)):
+                    continue
+                if task:
+                    prefix = [f"[span] {name}" for name in task["spans"]]
+            elif self.issue_id is not None:
+                continue
+
+            samples = self.samples.setdefault(thread_names.get(thread_id, str(thread_id)), Counter())
+            samples[tuple(prefix + frame_stack(frame))] += 1
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                if time.monotonic() - self.started_at > self.duration:
+                    break
+                self._sample()
+        finally:
+            self.finished_at = time.monotonic()
+            self.save()
+
+    def save(self):
+        if self.path.endswith(".folded"):
+            content = self.collapsed()
+        else:
+            content = json.dumps(self.speedscope())
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(content)
+        logger.info("Profile is saved", extra={"path": self.path, "samples": sum(sum(x.values()) for x in self.samples.values())})
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's collapsed stacks, input of flamegraph.pl and speedscope.
+        """
+        lines = []
+        for thread_name, samples in self.samples.items():
+            for stack, count in samples.items():
+                lines.append(f"{';'.join((thread_name,) + stack)} {count}")
+        return "\n".join(lines)
+
+    def speedscope(self) -> dict:
+        frames, index = [], {}
+        profiles = []
+        for thread_name, samples in self.samples.items():
+            stacks, weights = [], []
+            for stack, count in samples.items():
+                for name in stack:
+                    if name not in index:
+                        index[name] = len(frames)
+                        frames.append({"name": name})
+                stacks.append([index[name] for name in stack])
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            })
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": os.path.basename(self.path),
+            "exporter": "gitlab-agent",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class LoopWatchdog():
+    """
+    Event loop lag monitor: the loop updates a heartbeat every `interval` seconds, a thread checks it.
+    When the loop does not respond longer than `threshold` the stack of the loop thread is captured,
+    it is the code blocking the loop.
+    """
+    def __init__(self, loop:asyncio.AbstractEventLoop, threshold:float=0.2, interval:float=0.05, history:int=50):
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = deque(maxlen=history)
+        self.loop_thread_id = None
+        self.beat = time.monotonic()
+        self.peak_lag = 0.0
+        self._stall = None
+        self._handle = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+
+    def start(self):
+        # called from the loop thread
+        self.loop_thread_id = threading.get_ident()
+        self._beat()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+
+    def _beat(self):
+        self.beat = time.monotonic()
+        self._handle = self.loop.call_later(self.interval, self._beat)
+
+    def lag(self) -> float:
+        """
+        Seconds the loop is late with the heartbeat now.
+        """
+        return max(time.monotonic() - self.beat - self.interval, 0)
+
+    def recent_lag(self) -> float:
+        """
+        Decaying peak of the lag, the loop answers requests only between stalls, so current lag alone is always low.
+        """
+        return max(self.lag(), self.peak_lag)
+
+    def _run(self):
+        decay = 0.5 ** (self.interval / 2 / LAG_HALF_LIFE)
+        while not self._stop.wait(self.interval / 2):
+            lag = self.lag()
+            self.peak_lag = max(lag, self.peak_lag * decay)
+            if lag > self.threshold:
+                if self._stall is None:
+                    self._stall = self._capture()
+                self._stall["duration_ms"] = round(lag * 1000)
+            elif self._stall is not None:
+                self.stalls.append(self._stall)
+                logger.warning("Event loop stall %d ms", self._stall["duration_ms"], extra={"stall": self._stall})
+                self._stall = None
+
+    def _capture(self) -> dict:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        task = loop_task_context(self.loop)
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": 0,
+            "run": dict(task["run"]) if task else {},
+            "spans": list(task["spans"]) if task else [],
+            "stack": frame_stack(frame) if frame else [],
+        }
+
+
+class Profiler():
+    """
+    Profiling of the process: always-on span timings and loop watchdog, on-demand sampling sessions.
+    """
+    def __init__(self, folder:str=None, interval:float=0.01, max_seconds:float=300, stall_threshold:float=0.2):
+        self.folder = folder or tempfile.mkdtemp(prefix="gitlab-agent-profiles-")
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.session = None
+        self.watchdog = LoopWatchdog(self.loop, threshold=stall_threshold) if stall_threshold else None
+
+        os.makedirs(self.folder, exist_ok=True)
+        if self.watchdog:
+            self.watchdog.start()
+
+    def start(self, duration:float=60, issue_id=None, format:str='speedscope') -> dict:
+        """
+        Start sampling the process or only the loop tasks of one issue run, for at most `max_seconds`.
+        """
+        if self.session and self.session.running:
+            raise RuntimeError("Profiling is already running")
+
+        suffix = "folded" if format == 'collapsed' else "speedscope.json"
+        scope = f"issue-{issue_id}" if issue_id is not None else "process"
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{scope}.{suffix}"
+        self.session = ProfileSession(
+            self.loop, self.loop_thread_id, os.path.join(self.folder, name),
+            interval=self.interval, duration=min(duration, self.max_seconds), issue_id=issue_id
+        )
+        self.session.start()
+        return {"profile": name, "duration": self.session.duration, "issue_id": issue_id}
+
+    def stop(self) -> dict:
+        if self.session is None:
+            return None
+        path = self.session.stop()
+        return {"profile": os.path.basename(path)}
+
+    def status(self) -> dict:
+        return {
+            "running": bool(self.session and self.session.running),
+            "profile": os.path.basename(self.session.path) if self.session else None,
+            "loop_lag_ms": round(self.watchdog.lag() * 1000) if self.watchdog else None,
+            "profiles": sorted(x for x in os.listdir(self.folder) if not x.startswith('.')),
+        }
+
+    def profile_path(self, name:str) -> str:
+        path = os.path.join(self.folder, os.path.basename(name))
+        return path if os.path.isfile(path) else None
+
+    def close(self):
+        if self.session and self.session.running:
+            self.session.stop()
+        if self.watchdog:
+            self.watchdog.stop()
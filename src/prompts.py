@@ -28,6 +28,8 @@ main = """# Mission: Airflow DAG Architect
         - **Production DAG:** Includes placeholders/skeleton code for data quality checks, task groups, error notifications, and retry logic.
         - **Sandbox DAG:** A streamlined DAG focused solely on the essential extract, transform, and load tasks.
 
+    - Leave template arguments of generator tools empty: the best matching DAG, task, DDL or data quality file of the project is used as a template automatically. Read repository files with `gitlab_*` tools only when a specific file must be used as a template.
+
 ### Phase 3: Task Implementation
 3.  **Generate Task Files:** Use the `generate_task_file` to create the individual task files (`/dags/<layer>/<source_system>/tasks/`).
     - These files will contain the detailed logic for each operator (e.g., `DockerOperator`, `BashOperator`) referenced in the DAG.
@@ -56,6 +58,7 @@ main = """# Mission: Airflow DAG Architect
 ### Phase 6: Delivery
 6.  **Finalize & Commit**
     - Create a new Git branch.
+    - Generator tools return an `artifact_id` handle instead of the file content. Pass it to `commit_file` (and to tools that need a generated file, like `generated_task` or `dag_file`) - do not copy file content between tools.
     - Commit all generated files with a commit message that clearly indicates the pipeline type (e.g., "feat: Add production ETL DAG for sales data" or "chore: Add sandbox script for temporary user import").
 
 ### **Project Structure Requirements**
@@ -119,6 +122,21 @@ dag_prompt = """# Mission: Airflow DAG Engineer
 - Use helpers library exactly as shown - it ensures correct multi-layer operation
 - Execute DDL scripts every run (no CI/CD for Spark metastore)
 
+## Execution Workflow:
+
+1. **Analyze** generation instructions thoroughly
+2. **Preserve** template structure and operator usage patterns
+3. **Modify** only what's explicitly required by the specifications
+4. **Maintain** helpers library usage exactly as template demonstrates
+5. **Ensure** DDL execution occurs on every run
+6. **Generate** core DAG file (`<dag_id>.py`)
+
+## Getting Started
+Begin analysis and generate the core DAG file with minimal, targeted changes only.
+
+## Output instructions
+{format_instructions}
+
 ## Input Specifications:
 
 **Airflow DAG ID:**
@@ -138,21 +156,6 @@ dag_prompt = """# Mission: Airflow DAG Engineer
 ```
 {generation_instructions}
 ```
-
-## Execution Workflow:
-
-1. **Analyze** generation instructions thoroughly
-2. **Preserve** template structure and operator usage patterns
-3. **Modify** only what's explicitly required by the specifications
-4. **Maintain** helpers library usage exactly as template demonstrates
-5. **Ensure** DDL execution occurs on every run
-6. **Generate** core DAG file (`<dag_id>.py`)
-
-## Getting Started
-Begin analysis and generate the core DAG file with minimal, targeted changes only.
-
-## Output instructions
-{format_instructions}
 """
 
 task_prompt = """# Mission: Airflow DAG Engineer
@@ -177,6 +180,19 @@ task_prompt = """# Mission: Airflow DAG Engineer
   2. Apply transformations per task requirements (e.g., casting, column adaptation)  
   3. Write result to a Hive-managed datalake table using `insertInto()`
 
+## Workflow:
+
+1. **Analyze** the requirements and instructions in full context
+2. **Identify** the minimal set of changes needed to meet the task goals.
+3. **Preserve** all template conventions: error handling, environment variable usage and e.t.c.
+4. **Follow** a single, self-contained Python file ready for execution in an spark-submit command
+
+## Getting Started
+Begin analysis and return **only** the complete, runnable PySpark script — no explanations, no markdown, no extra text.
+
+## Output instructions
+{format_instructions}
+
 ## Input Specifications:
 
 
@@ -192,19 +208,6 @@ task_prompt = """# Mission: Airflow DAG Engineer
 
 **File name:**
 `{file_name}`
-
-## Workflow:
-
-1. **Analyze** the requirements and instructions in full context
-2. **Identify** the minimal set of changes needed to meet the task goals.
-3. **Preserve** all template conventions: error handling, environment variable usage and e.t.c.
-4. **Follow** a single, self-contained Python file ready for execution in an spark-submit command
-
-## Getting Started
-Begin analysis and return **only** the complete, runnable PySpark script — no explanations, no markdown, no extra text.
-
-## Output instructions
-{format_instructions}
 """
 
 dq_prompt = """# Mission: Airflow DAG Engineer
@@ -229,6 +232,19 @@ dq_prompt = """# Mission: Airflow DAG Engineer
   2. Look at destination table and decide wich column potencially might be checked to null, duplicates or distinct values. For example, checking the 'city' column for distinct values - to see the unique values in the data quality (DQ) log and verify they fall within the expected range in the monitoring system.
   3. Write result to a Hive-managed datalake table using `insertInto()`
 
+## Workflow:
+
+1. **Analyze** the requirements and instructions in full context
+2. **Identify** the minimal set of changes needed to meet the task goals.
+3. **Preserve** all template conventions: error handling, environment variable usage and e.t.c.
+4. **Follow** a single, self-contained Python file ready for execution in an spark-submit command
+
+## Getting Started
+Begin analysis and return **only** the complete, runnable PySpark script — no explanations, no markdown, no extra text.
+
+## Output instructions
+{format_instructions}
+
 ## Input Specifications:
 
 
@@ -249,19 +265,6 @@ dq_prompt = """# Mission: Airflow DAG Engineer
 
 **File name:**
 `{file_name}`
-
-## Workflow:
-
-1. **Analyze** the requirements and instructions in full context
-2. **Identify** the minimal set of changes needed to meet the task goals.
-3. **Preserve** all template conventions: error handling, environment variable usage and e.t.c.
-4. **Follow** a single, self-contained Python file ready for execution in an spark-submit command
-
-## Getting Started
-Begin analysis and return **only** the complete, runnable PySpark script — no explanations, no markdown, no extra text.
-
-## Output instructions
-{format_instructions}
 """
 
 
@@ -292,6 +295,20 @@ ddl_prompt = """# Mission: Airflow DAG Engineer
   3. Recreate external table 
   3. Repair table for partitioned tables
 
+## Workflow:
+
+1. **Analyze** the requirements and instructions in full context
+2. **Identify** the minimal set of changes needed to meet the task goals.
+3. **Follow** a single, self-contained sql file ready for execution in an spark-sql command
+
+## Getting Started
+Begin analysis and return **only** the complete, sql script — no explanations, no markdown, no extra text.
+
+## Output instructions
+```
+{format_instructions}
+```
+
 ## Input Specifications:
 
 **DDL Template:**
@@ -311,27 +328,20 @@ ddl_prompt = """# Mission: Airflow DAG Engineer
 
 **File name:**
 `{file_name}`
+"""
 
-## Workflow:
 
-1. **Analyze** the requirements and instructions in full context
-2. **Identify** the minimal set of changes needed to meet the task goals.
-3. **Follow** a single, self-contained sql file ready for execution in an spark-sql command
+doc_prompt = """# Mission: Airflow DAG Architect
 
-## Getting Started
-Begin analysis and return **only** the complete, sql script — no explanations, no markdown, no extra text.
+**Role:** You are an expert Apache Airflow ETL architect.
+**Goal:** Provide etl documentation based on documentation type, context and additional instructions.
 
 ## Output instructions
 ```
 {format_instructions}
 ```
-"""
-
 
-doc_prompt = """# Mission: Airflow DAG Architect
-
-**Role:** You are an expert Apache Airflow ETL architect.
-**Goal:** Provide etl documentation based on documentation type, context and additional instructions.
+## Input Specifications:
 
 **Airflow DAG file:**
 ```py
@@ -350,18 +360,15 @@ doc_prompt = """# Mission: Airflow DAG Architect
 
 **File name:**
 `{file_name}`
-
-## Output instructions
-```
-{format_instructions}
-```
 """
 
 async def main_prompt(state, config):
+    # Static instructions go first and the dynamic environment header last,
+    # so every call shares a byte-identical prefix the provider can cache.
     date = datetime.now().strftime("%Y-%m-%d")
     _env = env.format(date=date)
     _main = main
 
-    system_prompt = f"{_env}\n\n{_main}"
+    system_prompt = f"{_main}\n\n{_env}"
 
     return [{"role": "system", "content": system_prompt}, *state["messages"]]
\ No newline at end of file
@@ -0,0 +1,194 @@
+import time
+import asyncio
+import logging
+
+from collections import deque
+
+from src.spec import issue_iid
+
+
+logger = logging.getLogger(__name__)
+
+
+# Priority classes in order of service
+PRIORITY_CLASSES = ['high', 'normal', 'low']
+
+# Issue labels mapped to priority class, labels not listed here keep `normal`
+PRIORITY_LABELS = {
+    'priority::high': 'high',
+    'priority::normal': 'normal',
+    'priority::low': 'low',
+    'sandbox': 'low',
+}
+
+
+def issue_labels(data:dict) -> list[str]:
+    """
+    Label titles from issue webhook, GitLab sends labels as objects, test payloads as strings.
+    """
+    labels = data.get('object_attributes', {}).get('labels') or data.get('labels') or []
+    return [x.get('title') if isinstance(x, dict) else x for x in labels]
+
+
+def issue_priority(data:dict) -> str:
+    classes = [PRIORITY_LABELS[label] for label in issue_labels(data) if label in PRIORITY_LABELS]
+    if not classes:
+        return 'normal'
+    # the most urgent label wins
+    return min(classes, key=PRIORITY_CLASSES.index)
+
+
+def issue_project(data:dict) -> int:
+    return data.get('project', {}).get('id') or data.get('object_attributes', {}).get('project_id')
+
+
+def issue_key(data:dict) -> tuple:
+    """
+    Scheduler key of the issue: full run and description updates of one issue never run at the same time.
+    """
+    return (issue_project(data), issue_iid(data))
+
+
+class Job():
+    def __init__(self, func, args:tuple, kwargs:dict, priority:str, project_id, start:float, finish:float, key=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.project_id = project_id
+        self.key = key
+        # virtual start and finish tags for fair queuing
+        self.start = start
+        self.finish = finish
+        self.enqueued_at = time.monotonic()
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class Scheduler():
+    """
+    Runs issue tasks in front of `process_issue_task`:
+    - strict priority between classes (high, normal, low)
+    - weighted fair queuing between projects inside a class
+    - global and per-project concurrency limits
+    - jobs with the same key (jobs of one issue) run one at a time, in submit order
+    """
+    def __init__(self, max_concurrency:int=4, project_quota:int=2, project_weights:dict=None):
+        self.max_concurrency = max_concurrency
+        self.project_quota = project_quota
+        self.project_weights = project_weights or {}
+
+        self._queues = {name: {} for name in PRIORITY_CLASSES}
+        self._last_finish = {}
+        self._vtime = 0.0
+        self._running = {}
+        self._running_keys = set()
+        self._tasks = set()
+        self._wait_stats = {name: {"started": 0, "wait_total": 0.0, "wait_max": 0.0} for name in PRIORITY_CLASSES}
+
+
+    def submit(self, func, *args, priority:str='normal', project_id=None, key=None, **kwargs) -> asyncio.Future:
+        """
+        Enqueue `func(*args, **kwargs)`, returned future is resolved when the job is finished.
+        Job is not started while another job with the same `key` is running.
+        """
+        if priority not in self._queues:
+            priority = 'normal'
+
+        weight = float(self.project_weights.get(str(project_id), 1.0))
+        start = max(self._vtime, self._last_finish.get(project_id, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[project_id] = finish
+
+        job = Job(func, args, kwargs, priority, project_id, start, finish, key)
+        self._queues[priority].setdefault(project_id, deque()).append(job)
+
+        self._dispatch()
+
+        return job.done
+
+
+    def _ready(self, queue:deque) -> Job:
+        """
+        First job of the project queue whose key is not running, jobs of a busy issue do not block other issues.
+        """
+        for job in queue:
+            if job.key is None or job.key not in self._running_keys:
+                return job
+        return None
+
+
+    def _next_job(self) -> Job:
+        for name in PRIORITY_CLASSES:
+            heads = [
+                self._ready(queue) for project_id, queue in self._queues[name].items()
+                if queue and self._running.get(project_id, 0) < self.project_quota
+            ]
+            heads = [job for job in heads if job is not None]
+            if heads:
+                job = min(heads, key=lambda x: x.finish)
+                self._queues[name][job.project_id].remove(job)
+                return job
+        return None
+
+
+    def _dispatch(self):
+        while sum(self._running.values()) < self.max_concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+
+            self._vtime = max(self._vtime, job.start)
+            self._running[job.project_id] = self._running.get(job.project_id, 0) + 1
+            if job.key is not None:
+                self._running_keys.add(job.key)
+
+            waited = time.monotonic() - job.enqueued_at
+            stats = self._wait_stats[job.priority]
+            stats["started"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+    async def _run(self, job:Job):
+        try:
+            res = await job.func(*job.args, **job.kwargs)
+            if not job.done.done():
+                job.done.set_result(res)
+        except Exception as e:
+            logger.exception("Scheduled job failed: %s", e)
+            if not job.done.done():
+                job.done.set_exception(e)
+                # nobody may await the future of webhook jobs
+                job.done.exception()
+        finally:
+            self._running[job.project_id] -= 1
+            self._running_keys.discard(job.key)
+            self._dispatch()
+
+
+    def inflight(self) -> int:
+        """
+        Running and queued jobs.
+        """
+        queued = sum(len(queue) for name in PRIORITY_CLASSES for queue in self._queues[name].values())
+        return sum(self._running.values()) + queued
+
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        res = {"running": {str(k): v for k, v in self._running.items() if v}, "classes": {}}
+        for name in PRIORITY_CLASSES:
+            queued = [job for queue in self._queues[name].values() for job in queue]
+            stats = self._wait_stats[name]
+            res["classes"][name] = {
+                "queued": len(queued),
+                "started": stats["started"],
+                "wait_avg": round(stats["wait_total"] / stats["started"], 3) if stats["started"] else 0.0,
+                "wait_max": round(stats["wait_max"], 3),
+                "oldest_wait": round(max([now - job.enqueued_at for job in queued], default=0.0), 3),
+            }
+        return res
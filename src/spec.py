@@ -0,0 +1,147 @@
+import re
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+# Row start of the issue parameter table: `| name | value ...`, value may continue on the next lines (DDL)
+ROW_START = re.compile(r'^\|\s*([A-Za-z_][\w ]*?)\s*\|', re.M)
+SEPARATOR = re.compile(r'^\|[\s:|-]+\|\s*$', re.M)
+
+
+def normalize_value(value:str) -> str:
+    value = value.strip()
+    if value.endswith('|'):
+        value = value[:-1].rstrip()
+    # same value written with different spaces or line endings is the same input
+    return "\n".join(line.rstrip() for line in value.replace('\r\n', '\n').split('\n'))
+
+
+def parse_parameter_table(description:str) -> tuple[str, dict[str, str]]:
+    """
+    Split issue description into the free text before the table and parameters of `| Parameter | Value |` table.
+    Parameter names are lower case with underscores.
+    """
+    description = description or ''
+    separator = SEPARATOR.search(description)
+    if not separator:
+        return description.strip(), {}
+
+    header_start = description.rfind('\n', 0, max(separator.start() - 1, 0)) + 1
+    summary = description[:header_start].strip()
+    table = description[separator.end():]
+
+    rows = list(ROW_START.finditer(table))
+    fields = {}
+    for i, row in enumerate(rows):
+        end = rows[i + 1].start() if i + 1 < len(rows) else len(table)
+        name = re.sub(r'\W+', '_', row.group(1).strip().lower())
+        fields[name] = normalize_value(table[row.end():end])
+
+    return summary, fields
+
+
+# Other names of the same parameter used in issues
+ALIASES = {
+    'schedule': 'interval',
+    'cron': 'interval',
+    'source_db': 'source_database',
+    'target': 'target_table',
+    'ddl': 'source_table_ddl',
+}
+
+TRUE_VALUES = {'true', 'yes', 'y', '1', 'да'}
+
+
+def compact_value(value:str) -> str:
+    # tabs and repeated spaces of pasted DDL cost tokens and carry no meaning
+    return "\n".join(re.sub(r'[ \t]+', ' ', line).strip() for line in value.split('\n') if line.strip())
+
+
+def issue_iid(data:dict) -> int:
+    """
+    Project scoped issue id (iid) of the issue payload. Project API, branch names and agent threads
+    use it, so webhook, batch and recovered runs of the issue share one thread.
+    """
+    attrs = data.get('object_attributes', {})
+    return attrs.get('iid') or attrs.get('id')
+
+
+class IssueSpec(BaseModel):
+    issue_id: int = Field(..., description="Gitlab issue iid in the project")
+    title: str = Field(..., description="Issue title")
+    summary: str = Field('', description="Free text before the parameter table")
+    labels: list[str] = Field([], description="Issue labels")
+
+    source_database: Optional[str] = Field(None, description="Source connection string")
+    database_available: Optional[bool] = Field(None, description="Source database is reachable through MCP tools")
+    source_table: Optional[str] = Field(None, description="Source table name")
+    source_table_ddl: Optional[str] = Field(None, description="Source table DDL")
+    interval: Optional[str] = Field(None, description="Airflow schedule")
+    required_transformations: Optional[str] = Field(None, description="Transformations to apply")
+    target_table: Optional[str] = Field(None, description="Target datalake table")
+    target_storing_type: Optional[str] = Field(None, description="full or increment")
+    capture_changes_column: Optional[str] = Field(None, description="Column to capture changes for increments")
+    data_quality: Optional[str] = Field(None, description="Data quality checks")
+
+    extra: dict[str, str] = Field({}, description="Parameters not known by the spec")
+
+    @classmethod
+    def from_issue(cls, data:dict) -> "IssueSpec":
+        """
+        Build spec from issue webhook payload.
+        """
+        attrs = data.get('object_attributes', {})
+        labels = attrs.get('labels') or data.get('labels') or []
+        summary, fields = parse_parameter_table(attrs.get('description'))
+
+        known, extra = {}, {}
+        for name, value in fields.items():
+            name = ALIASES.get(name, name)
+            if name in cls.model_fields and name not in ('issue_id', 'title', 'summary', 'labels', 'extra'):
+                known[name] = value
+            else:
+                extra[name] = value
+
+        if 'database_available' in known:
+            known['database_available'] = known['database_available'].strip().lower() in TRUE_VALUES
+        if 'source_table_ddl' in known:
+            known['source_table_ddl'] = compact_value(known['source_table_ddl'])
+
+        return cls(
+            issue_id=issue_iid(data),
+            title=attrs.get('title') or '',
+            summary=summary,
+            labels=[x.get('title') if isinstance(x, dict) else x for x in labels],
+            extra=extra,
+            **{k: v for k, v in known.items() if v != ''},
+        )
+
+
+    def parameters(self) -> dict[str, str]:
+        """
+        Issue parameters as strings, the inputs generated files depend on.
+        """
+        params = self.model_dump(exclude={'issue_id', 'title', 'summary', 'labels', 'extra'}, exclude_none=True)
+        params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items()}
+        return {**params, **self.extra}
+
+
+    def to_prompt(self) -> str:
+        """
+        Compact normalized spec for the agent: one `name: value` line per parameter, multi-line values as indented blocks.
+        """
+        lines = [f"issue_id: {self.issue_id}", f"issue_title: {self.title}"]
+        if self.labels:
+            lines.append(f"labels: {', '.join(self.labels)}")
+        if self.summary:
+            lines.append(f"summary: {self.summary}")
+
+        for name, value in self.parameters().items():
+            if "\n" in value:
+                lines.append(f"{name}: |")
+                lines.extend(f"  {line}" for line in value.split("\n"))
+            else:
+                lines.append(f"{name}: {value}")
+
+        return "\n".join(lines)
@@ -1,4 +1,8 @@
 import json
+import time
+import asyncio
+import logging
+import hashlib
 from retry import retry
 
 from pydantic import BaseModel, Field
@@ -7,39 +11,209 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
 
 from src.gitwork import GitWorker
+from src.utils import get_artifacts, get_run_budget
+from src.budget import BudgetExceeded, BUDGET_LABEL
+from src.logs import start_run
+from src.profiling import spans
+from src.spec import IssueSpec
+from src import manifest as artifacts_manifest
 
 
-async def process_issue_task(data, agent, git:GitWorker):
-    print('Starting processing issue')
-    issue_id = data.get('object_attributes', {}).get('id')
-    description = data.get('object_attributes', {}).get('description')
-    title = data.get('object_attributes', {}).get('title')
-
-    data = f"""You have to solve a task:
-    - issue_id: {issue_id}
-    - issue_title: `{title}`
-    - description: 
-    ```
-    {description}
-    ```
-    """
-    print(f"Starting processing {issue_id}: {title}")
+logger = logging.getLogger(__name__)
 
-    res = await agent.ainvoke(json.dumps(data, ensure_ascii=False), issue_id)
 
+def usage_summary(res) -> str:
     total_tokens = sum([x.get('agent').get('messages')[0].usage_metadata.get('total_tokens') for x in res if x.get('agent')])
     input_tokens = sum([x.get('agent').get('messages')[0].usage_metadata.get('input_tokens') for x in res if x.get('agent')])
     output_tokens = sum([x.get('agent').get('messages')[0].usage_metadata.get('output_tokens') for x in res if x.get('agent')])
+    # Providers that support prompt caching report prefix hits in input_token_details
+    cached_tokens = sum([(x.get('agent').get('messages')[0].usage_metadata.get('input_token_details') or {}).get('cache_read', 0) for x in res if x.get('agent')])
+
+    return f"Total tokens: {total_tokens} were used (input tokens: {input_tokens}, cached input tokens: {cached_tokens}, output tokens: {output_tokens})"
+
+
+def save_manifest(issue_id, thread_id:str, fields:dict, manifest:dict=None) -> dict:
+    """
+    Record committed files of the run with issue parameters they were generated from.
+    Manifest is the agent bookkeeping, it is stored with artifacts and never committed to the merge request branch.
+    """
+    artifacts = get_artifacts()
+    committed = [x for x in artifacts.list(thread_id) if x.get('committed')]
+    if not committed:
+        return manifest
+
+    branch_name = committed[-1]['branch_name']
+    manifest = artifacts_manifest.build_manifest(issue_id, branch_name, fields, committed, manifest)
+    artifacts.save_manifest(issue_id, manifest)
+    return manifest
+
+
+async def stop_over_budget(agent, git:GitWorker, issue_id, thread_id:str, branch_name:str, fields:dict, error:BudgetExceeded, manifest:dict=None):
+    """
+    Graceful stop of the run over budget: generated files not committed by the agent are committed to the branch,
+    usage breakdown is posted to the issue. Issue stays open and is labeled, so it is not recovered on restart.
+    The thread is dropped together with its artifacts: when the label is removed the issue is processed
+    from scratch with a fresh budget, pending tool calls of the stopped run never reference deleted artifacts.
+    """
+    artifacts = get_artifacts()
+    committed = []
+    for meta in artifacts.list(thread_id):
+        if meta.get('committed'):
+            continue
+        res = git.gitlab_commit_file(
+            branch_name=branch_name, 
+            filename=meta['filename'], 
+            filecontent=artifacts.read(meta['artifact_id']), 
+            task=meta.get('commit_message') or f"Add {meta['filename']}"
+        )
+        if res.get('success'):
+            artifacts.update_meta(meta['artifact_id'], committed=True, branch_name=branch_name)
+            committed.append(meta['filename'])
+
+    save_manifest(issue_id, thread_id, fields, manifest)
+    artifacts.cleanup(thread_id)
+    await agent.reset(thread_id)
+
+    files = ", ".join(committed) or "none"
+    git.add_notes(issue_id, f"Processing stopped: {error.reason}. Generated files committed to `{branch_name}` on stop: {files}. {error.usage.summary()}. {usage_summary(error.chunks)}.")
+    git.add_labels(issue_id, [BUDGET_LABEL])
+    logger.warning("Issue stopped over budget: %s", error.reason, extra={"usage": error.usage.summary()})
 
-    git.add_notes(issue_id, f"Processing finished. Total tokens: {total_tokens} were used (input tokens: {input_tokens}, output tokens: {output_tokens})")
+
+async def process_issue_task(data, agent, git:GitWorker):
+    spec = IssueSpec.from_issue(data)
+    issue_id = spec.issue_id
+    title = spec.title
+    run_id = start_run(issue_id=issue_id)
+
+    if BUDGET_LABEL in spec.labels:
+        # run was stopped over budget, it is started again only when the label is removed
+        logger.info("Issue is labeled %s, skipping", BUDGET_LABEL)
+        return
+
+    # compact normalized spec instead of raw Markdown description
+    message = f"You have to solve a task:\n{spec.to_prompt()}"
+    logger.info("Starting processing issue", extra={"title": title})
+
+    resumed = await agent.unfinished(issue_id)
+    started = time.monotonic()
+
+    try:
+        res = await agent.ainvoke(message, issue_id, budget=get_run_budget(spec.labels))
+    except BudgetExceeded as e:
+        branch_name = git.gitlab_create_branch(issue_id=issue_id, task_title=title)
+        await stop_over_budget(agent, git, issue_id, str(issue_id), branch_name, spec.parameters(), e)
+        return
+
+    save_manifest(issue_id, str(issue_id), spec.parameters())
+
+    resumed_note = f" Run was resumed from the last checkpoint and finished in {time.monotonic() - started:.0f}s." if resumed else ""
+    git.add_notes(issue_id, f"Processing finished. {usage_summary(res)}.{resumed_note}")
     git.create_merge_request(issue_id=issue_id)
     git.close_issue(issue_id=issue_id)
+    get_artifacts().cleanup(str(issue_id))
 
-    print(f"Issue id: {issue_id} is done.")
+    logger.info("Issue is done", extra={"spans": spans.snapshot(run_id)})
 
-    
 
+async def recover_interrupted_issues(agent, git:GitWorker, submit):
+    """
+    Find open issues whose agent thread stopped in the middle of a run (e.g. pod was killed)
+    and submit them again, `agent.ainvoke` continues such threads from the last checkpoint.
+    """
+    recovered = 0
+    # python-gitlab pages through issues with blocking requests
+    issues = await asyncio.to_thread(lambda: list(git.list_open_issues()))
+    for issue in issues:
+        if BUDGET_LABEL in issue.labels:
+            continue
+        if await agent.unfinished(issue.iid):
+            logger.info("Recovering interrupted run", extra={"issue_id": issue.iid, "title": issue.title})
+            submit(git.issue_payload(issue))
+            recovered += 1
+
+    logger.info("Interrupted runs recovered: %d", recovered)
+
+
+async def process_issue_update_task(data, agent, git:GitWorker):
+    """
+    Issue description was edited: regenerate only files whose issue parameters changed
+    and push them to the existing branch with `update` commits.
+    """
+    spec = IssueSpec.from_issue(data)
+    issue_id = spec.issue_id
+    run_id = start_run(issue_id=issue_id)
+
+    manifest = get_artifacts().load_manifest(issue_id)
+    if manifest is None:
+        logger.info("Issue has no generated files manifest, starting full processing")
+        return await process_issue_task(data, agent, git)
+
+    fields = spec.parameters()
+    stale = artifacts_manifest.stale_artifacts(manifest, fields)
+    if not stale:
+        logger.info("Issue edit does not affect generated files")
+        git.add_notes(issue_id, "Issue was edited, generated files do not depend on changed parameters. Nothing to regenerate.")
+        return
+
+    branch_name = manifest['branch_name']
+    files = "\n".join(f"    - `{filename}` (changed parameters: {', '.join(changed)})" for filename, changed in stale.items())
+    message = f"""The issue was edited, previously generated files are in the branch `{branch_name}`.
+    - regenerate only these files, keep their paths and use their current content from the branch as a template:
+{files}
+    - commit them to the existing branch `{branch_name}` with commit message starting with `update: `, do not create a new branch
+    - current issue spec:
+    ```
+{spec.to_prompt()}
+    ```
+    """
+    # separate thread per edit, the full run history is not replayed
+    thread_id = f"{issue_id}-update-{hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:12]}"
+    logger.info("Starting issue update", extra={"stale": list(stale)})
+
+    try:
+        res = await agent.ainvoke(message, thread_id, budget=get_run_budget(spec.labels))
+    except BudgetExceeded as e:
+        await stop_over_budget(agent, git, issue_id, thread_id, branch_name, fields, e, manifest)
+        return
+
+    save_manifest(issue_id, thread_id, fields, manifest)
+    get_artifacts().cleanup(thread_id)
 
+    git.add_notes(issue_id, f"Update finished, regenerated files: {', '.join(stale)}. {usage_summary(res)}.")
+    # branch of the first run, the title may have been edited since then
+    git.create_merge_request(issue_id=issue_id, branch_name=branch_name)
 
+    logger.info("Issue update is done", extra={"spans": spans.snapshot(run_id)})
 
 
+# Job kind to task function
+ISSUE_TASKS = {
+    'issue': process_issue_task,
+    'issue_update': process_issue_update_task,
+}
+
+
+def issue_task_kind(data:dict) -> str:
+    """
+    Job kind for issue event or None for events that start nothing:
+    - open, reopen and payloads without action (batch, recovery) are a full run
+    - description edit of already processed issue is an update
+    - removal of the budget label restarts the run stopped over budget
+    Other updates (labels, notes), closing by the agent itself and so on are ignored.
+    """
+    action = data.get('object_attributes', {}).get('action')
+    changes = data.get('changes', {})
+    if action in (None, 'open', 'reopen'):
+        return 'issue'
+    if action != 'update':
+        return None
+    if 'description' in changes:
+        return 'issue_update'
+
+    labels = changes.get('labels', {})
+    previous = [x.get('title') if isinstance(x, dict) else x for x in labels.get('previous') or []]
+    current = [x.get('title') if isinstance(x, dict) else x for x in labels.get('current') or []]
+    if BUDGET_LABEL in previous and BUDGET_LABEL not in current:
+        return 'issue'
+    return None
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import hashlib
+import tempfile
+import threading
+
+from collections import Counter
+
+from src.gitwork import GitWorker
+
+
+TOKEN = re.compile(r'[a-z][a-z0-9]+')
+
+EMPTY_SHA = "0" * 40
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text:str) -> list[str]:
+    # snake_case and dotted names are split into words
+    return TOKEN.findall(text.lower().replace('_', ' '))
+
+
+def git_blob_id(content:str) -> str:
+    data = content.encode('utf-8')
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def template_kind(path:str) -> str:
+    """
+    Kind of generator template for repository file or None for files not used as templates.
+    """
+    name = os.path.basename(path).lower()
+    if name.endswith('.sql') or 'ddl' in name:
+        return 'ddl'
+    if not name.endswith('.py') or name == '__init__.py':
+        return None
+    if '/tasks/' in path:
+        return 'dq' if ('dq' in name or 'quality' in name) else 'task'
+    return 'dag'
+
+
+class TemplateIndex():
+    """
+    Local keyword index of DAGs, Spark tasks and DDL of the target project.
+    Generator tools take the best matching file as template instead of the agent reading the repository.
+    Index is updated incrementally: only files with changed blob id are downloaded.
+    """
+    def __init__(self, git:GitWorker, folder:str=None, root:str='dags', ref:str='main', max_age:int=600):
+        self.git = git
+        self.folder = folder or tempfile.mkdtemp(prefix="gitlab-agent-index-")
+        self.root = root
+        self.ref = ref
+        self.max_age = max_age
+        self.entries = {}
+        self.refreshed_at = 0.0
+        self.loaded_mtime = 0.0
+        # updates download files without blocking readers, new entries are swapped in under `_lock`
+        self._lock = threading.RLock()
+        self._update_lock = threading.Lock()
+
+        os.makedirs(os.path.join(self.folder, "blobs"), exist_ok=True)
+
+
+    def _index_path(self) -> str:
+        return os.path.join(self.folder, "index.json")
+
+
+    def _blob_path(self, blob_id:str) -> str:
+        return os.path.join(self.folder, "blobs", blob_id)
+
+
+    def _write(self, path:str, data:str):
+        # folder can be shared with other processes, readers never see a partly written file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+    def in_root(self, path:str) -> bool:
+        root = self.root.strip('/')
+        return not root or path == root or path.startswith(root + '/')
+
+
+    def load(self):
+        """
+        Load the saved index, in job queue mode the index saved by the API process after a push.
+        """
+        if not os.path.exists(self._index_path()):
+            return
+        mtime = os.path.getmtime(self._index_path())
+        with open(self._index_path(), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        with self._lock:
+            self.entries = entries
+            self.loaded_mtime = mtime
+
+
+    def save(self):
+        self._write(self._index_path(), json.dumps(self.entries))
+        self.loaded_mtime = os.path.getmtime(self._index_path())
+
+
+    def _add(self, entries:dict, path:str, content:str, blob_id:str=None):
+        kind = template_kind(path)
+        if kind is None:
+            return
+
+        blob_id = blob_id or git_blob_id(content)
+        self._write(self._blob_path(blob_id), content)
+
+        tokens = Counter(tokenize(path) + tokenize(content))
+        entries[path] = {"kind": kind, "blob_id": blob_id, "length": sum(tokens.values()), "tokens": dict(tokens)}
+
+
+    def _swap(self, entries:dict):
+        """
+        Replace index entries and remove blobs no longer used by any entry.
+        """
+        with self._lock:
+            used = {x["blob_id"] for x in entries.values()}
+            removed = {x["blob_id"] for x in self.entries.values()} - used
+            self.entries = entries
+            self.refreshed_at = time.monotonic()
+            for blob_id in removed:
+                try:
+                    os.remove(self._blob_path(blob_id))
+                except FileNotFoundError:
+                    pass
+            self.save()
+
+
+    def refresh(self) -> int:
+        """
+        Sync index with repository tree by blob ids, returns number of downloaded files.
+        """
+        with self._update_lock:
+            return self._refresh()
+
+
+    def _refresh(self) -> int:
+        tree = {x["path"]: x["id"] for x in self.git.list_tree(self.root, self.ref) if template_kind(x["path"])}
+
+        entries = {path: entry for path, entry in self.entries.items() if path in tree}
+        downloaded = 0
+        for path, blob_id in tree.items():
+            if entries.get(path, {}).get("blob_id") == blob_id:
+                continue
+            content = self.git.get_file_content(path, ref=self.ref)
+            if content is not None:
+                self._add(entries, path, content, blob_id)
+                downloaded += 1
+
+        self._swap(entries)
+        return downloaded
+
+
+    def refresh_if_stale(self):
+        """
+        Refresh old index, when repository is not available the stale index is used until the next `max_age`.
+        While another thread refreshes the index the current one is used.
+        """
+        try:
+            if os.path.getmtime(self._index_path()) > self.loaded_mtime:
+                self.load()
+        except FileNotFoundError:
+            pass
+
+        if time.monotonic() - self.refreshed_at <= self.max_age:
+            return
+        if not self._update_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh()
+        except Exception as e:
+            self.refreshed_at = time.monotonic()
+            logger.warning("Templates index refresh failed, using stale index: %s", e)
+        finally:
+            self._update_lock.release()
+
+
+    def apply_push(self, payload:dict) -> int:
+        """
+        Update index from GitLab push webhook using the diff between `before` and `after` commits.
+        `after` is applied only when it is the current head of the branch, otherwise
+        (push delivered late, payload not from GitLab) the index is synced with the branch tree.
+        """
+        if payload.get("ref") != f"refs/heads/{self.ref}":
+            return 0
+
+        with self._update_lock:
+            before, after = payload.get("before"), payload.get("after")
+            if not before or before == EMPTY_SHA or not after or after != self.git.branch_head(self.ref):
+                return self._refresh()
+
+            changed, removed = self.git.changed_paths(before, after)
+            entries = dict(self.entries)
+            for path in removed:
+                entries.pop(path, None)
+
+            updated = 0
+            for path in changed:
+                if not self.in_root(path) or not template_kind(path):
+                    continue
+                content = self.git.get_file_content(path, ref=after)
+                if content is None:
+                    entries.pop(path, None)
+                else:
+                    self._add(entries, path, content)
+                    updated += 1
+
+            self._swap(entries)
+            return updated
+
+
+    def search(self, kind:str, query:str, limit:int=3) -> list[tuple[str, float]]:
+        """
+        BM25 search among files of the kind, returns (path, score) best first.
+        """
+        docs = {path: entry for path, entry in self.entries.items() if entry["kind"] == kind}
+        if not docs:
+            return []
+
+        terms = set(tokenize(query))
+        avg_length = sum(x["length"] for x in docs.values()) / len(docs)
+        k1, b = 1.5, 0.75
+
+        scores = []
+        for path, entry in docs.items():
+            score = 0.0
+            for term in terms:
+                tf = entry["tokens"].get(term, 0)
+                if not tf:
+                    continue
+                df = sum(1 for x in docs.values() if term in x["tokens"])
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * entry["length"] / avg_length))
+            scores.append((path, score))
+
+        return sorted(scores, key=lambda x: -x[1])[:limit]
+
+
+    def content(self, path:str) -> str:
+        with open(self._blob_path(self.entries[path]["blob_id"]), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+    def best_template(self, kind:str, query:str) -> str:
+        """
+        Content of the best matching file of the kind or empty string when index has no such files.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            found = self.search(kind, query, limit=1)
+            if not found:
+                return ""
+
+            path, _ = found[0]
+            return self.content(path)
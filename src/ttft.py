@@ -0,0 +1,81 @@
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+from datetime import datetime
+
+from src.prompts import main, env
+
+
+logger = logging.getLogger(__name__)
+
+# Layouts of the agent system prompt: static instructions first (current) or the environment header first
+LAYOUTS = ['static_first', 'dynamic_first']
+
+QUESTION = "Reply with one word: ready."
+
+
+def system_prompt(layout:str, call:int) -> str:
+    # the header differs between calls, like the date does between days
+    header = env.format(date=f"{datetime.now():%Y-%m-%d} (call {call})")
+    return f"{main}\n\n{header}" if layout == 'static_first' else f"{header}\n\n{main}"
+
+
+async def measure(model, layout:str, call:int) -> dict:
+    """
+    Time to first token, total time and cached input tokens of one streamed call.
+    """
+    started = time.perf_counter()
+    ttft, usage = None, {}
+    async for chunk in model.astream([("system", system_prompt(layout, call)), ("human", QUESTION)]):
+        if ttft is None and chunk.content:
+            ttft = time.perf_counter() - started
+        if chunk.usage_metadata:
+            usage = chunk.usage_metadata
+
+    return {
+        "ttft": ttft,
+        "total": time.perf_counter() - started,
+        "input_tokens": usage.get('input_tokens', 0),
+        "cached_tokens": (usage.get('input_token_details') or {}).get('cache_read', 0),
+    }
+
+
+async def main_bench(runs:int):
+    from src.utils import build_model, get_model, init_logging
+
+    init_logging()
+    await build_model()
+    model = (await get_model()).bind(max_tokens=8, stream_usage=True)
+
+    results = {name: [] for name in LAYOUTS}
+    for call in range(runs):
+        # layouts alternate, so both see the same provider load
+        for layout in LAYOUTS:
+            results[layout].append(await measure(model, layout, call))
+
+    for layout, calls in results.items():
+        ttfts = [x["ttft"] for x in calls if x["ttft"] is not None]
+        logger.info("TTFT of %s layout: median %.3fs", layout, statistics.median(ttfts) if ttfts else float('nan'), extra={
+            "layout": layout,
+            "calls": len(calls),
+            "ttft_median": statistics.median(ttfts) if ttfts else None,
+            "ttft_max": max(ttfts, default=None),
+            "total_median": statistics.median(x["total"] for x in calls),
+            "input_tokens": sum(x["input_tokens"] for x in calls),
+            "cached_tokens": sum(x["cached_tokens"] for x in calls),
+        })
+
+
+if __name__ == '__main__':
+    """
+    Time to first token of the agent system prompt before and after the static prefix layout:
+    `python -m src.ttft --runs 10`
+    """
+    arg_parser = argparse.ArgumentParser(description="Benchmark time to first token of system prompt layouts")
+    arg_parser.add_argument('--runs', type=int, default=5, help="Calls per layout, the first call warms the provider cache")
+    args = arg_parser.parse_args()
+
+    asyncio.run(main_bench(args.runs))
@@ -1,14 +1,19 @@
 import asyncio
 import json
+import logging
+import time
+import hashlib
 
 from typing import Any, List
 from pydantic import BaseModel, Field
 from pydantic import ValidationError
 from datetime import datetime
 
-from langchain_core.tools import tool
+from langchain_core.tools import tool, StructuredTool
+from langchain_core.runnables import RunnableConfig
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
 
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
@@ -20,19 +25,26 @@ from psycopg.rows import dict_row
 
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
+from openai import BadRequestError
+
 from src.model import AppConfig
 from src.gitwork import GitWorker
+from src.localgit import LocalGitWorker
+from src.budget import RunBudget, RunUsage, BudgetExceeded, BudgetCallbackHandler
+from src.logs import run_context, sampled, setup_logging
+from src.profiling import Profiler, SpanCallbackHandler, span, trace_object
+from src.admission import AdmissionController
+from src.artifacts import ArtifactStore, ArtifactNotFound
+from src.scheduler import Scheduler
+from src.jobs import JobQueue
+from src.templates import TemplateIndex
 from src.prompts import main_prompt
 from src.prompts import dag_prompt, task_prompt, ddl_prompt, doc_prompt, dq_prompt
 
-from langfuse import Langfuse, get_client
+from langfuse import Langfuse
 from langfuse.langchain import CallbackHandler
 
-lf  = Langfuse(
-    public_key="pk-lf-2acd524f-a2f1-48cb-b163-8f5f2b36bc5b",
-    secret_key="sk-lf-f5a1610e-5034-480b-b398-7ec491247572",
-    host="https://langfuse.it-brew-lct2025.ru"
-)
+logger = logging.getLogger(__name__)
 
 _config: dict = None
 
@@ -48,12 +60,64 @@ def get_config():
         return config
     
     except ValidationError as e:
-        print("Configuration error:")
-        print(e.errors())
+        logger.error("Configuration error", extra={"errors": e.errors()})
         # Exit or handle error appropriately
         raise
 
 
+def init_logging():
+    conf = get_config()
+    setup_logging(level=conf.LOG_LEVEL, max_length=conf.LOG_MAX_FIELD_LENGTH, debug_sample_rate=conf.LOG_DEBUG_SAMPLE_RATE)
+
+
+# Schema lookups shared between runs, e.g. issues of one batch loading the same source table
+CACHED_TOOLS = ['get_db_table_ddl', 'get_s3_bucket_parquet_schema']
+
+_tool_cache: dict = {}
+
+def cached_tool(source_tool: StructuredTool, ttl: int) -> StructuredTool:
+    """
+    Wrap MCP tool with in-process cache.
+    Concurrent calls with the same arguments share one request to MCP server.
+    """
+    async def _call(**kwargs):
+        key = (source_tool.name, json.dumps(kwargs, sort_keys=True, default=str))
+        cached = _tool_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return await asyncio.shield(cached[1])
+
+        future = asyncio.ensure_future(source_tool.coroutine(**kwargs))
+        _tool_cache[key] = (time.monotonic() + ttl, future)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            _tool_cache.pop(key, None)
+            raise
+
+    return StructuredTool(
+        name=source_tool.name,
+        description=source_tool.description,
+        args_schema=source_tool.args_schema,
+        coroutine=_call,
+        response_format=source_tool.response_format,
+        metadata=source_tool.metadata,
+    )
+
+
+def traced_tool(source_tool: StructuredTool) -> StructuredTool:
+    """
+    Wrap tool call as `tool.<name>` span.
+    """
+    return StructuredTool(
+        name=source_tool.name,
+        description=source_tool.description,
+        args_schema=source_tool.args_schema,
+        coroutine=span(f"tool.{source_tool.name}")(source_tool.coroutine),
+        response_format=source_tool.response_format,
+        metadata=source_tool.metadata,
+    )
+
+
 class LLMAgent():
 
     def __init__(self, 
@@ -64,7 +128,7 @@ class LLMAgent():
                  tools: list, 
                  checkpointer, 
                  langfuse, 
-                 langfuse_handler
+                 trace_sample_rate: float = 1.0
         ): 
         self.api_key = api_key
         self.base_url = base_url
@@ -73,16 +137,20 @@ class LLMAgent():
         self.tools = tools
         self.checkpointer = checkpointer
         self.langfuse = langfuse
-        self.langfuse_handler = langfuse_handler
+        self.trace_sample_rate = trace_sample_rate
+        self.span_handler = SpanCallbackHandler()
         
         self.llm = ChatOpenAI(api_key=self.api_key, base_url=self.base_url, model=self.model, temperature=0.1)
         self.agent = create_react_agent(self.llm, tools=self.tools, prompt=main_prompt, checkpointer=self.checkpointer)
 
     @classmethod
-    async def create(cls, api_key: str, base_url: str, folder: str, model: str, mcp_configs: dict, pg_url: str): 
+    async def create(cls, api_key: str, base_url: str, folder: str, model: str, mcp_configs: dict, pg_url: str, tool_cache_ttl: int = 0,
+                     langfuse_options: dict = None, trace_sample_rate: float = 1.0): 
         
         client = MultiServerMCPClient(mcp_configs)
         all_tools = await client.get_tools() 
+        if tool_cache_ttl:
+            all_tools = [cached_tool(tool, tool_cache_ttl) if tool.name in CACHED_TOOLS else tool for tool in all_tools]
         tools = (
             [tool for tool in all_tools if tool.name.startswith('gitlab_')] 
             + 
@@ -97,9 +165,10 @@ class LLMAgent():
                 generate_dq_task_file
             ]
         )
+        tools = [traced_tool(tool) for tool in tools]
 
-        lf_client = get_client()
-        langfuse_handler = CallbackHandler()
+        # client exports spans from a background thread in batches of `flush_at` or every `flush_interval` seconds
+        lf_client = Langfuse(**langfuse_options) if langfuse_options else None
 
         if pg_url:
             aconn = await AsyncConnection.connect(pg_url, autocommit=True, row_factory=dict_row)
@@ -107,6 +176,7 @@ class LLMAgent():
             await checkpointer.setup()
         else:
             checkpointer = InMemorySaver()
+        trace_object(checkpointer, "checkpointer", ["aget_tuple", "aput", "aput_writes"])
 
         agent = cls(
             api_key=api_key, 
@@ -116,34 +186,98 @@ class LLMAgent():
             tools=tools, 
             checkpointer=checkpointer, 
             langfuse=lf_client, 
-            langfuse_handler=langfuse_handler)
+            trace_sample_rate=trace_sample_rate)
         
         return agent
         
     
-    async def ainvoke(self, message, idx: int):
+    async def unfinished(self, idx: int) -> bool:
+        """
+        Thread has pending steps in the last checkpoint: tool calls not executed or agent step not finished.
+        """
+        state = await self.agent.aget_state({"configurable": {"thread_id": str(idx)}})
+        return bool(state.next)
+
+    async def reset(self, idx):
+        """
+        Drop all checkpoints of the thread, the next run of the thread starts from scratch.
+        """
+        await self.checkpointer.adelete_thread(str(idx))
+
+    def callbacks(self, idx) -> list:
+        """
+        LLM span timings and new Langfuse handler per run, runs out of sample are not traced by Langfuse at all.
         """
+        if self.langfuse is None or not sampled(str(idx), self.trace_sample_rate):
+            return [self.span_handler]
+        return [self.span_handler, CallbackHandler()]
+
+    async def ainvoke(self, message, idx: int, budget: RunBudget = None):
+        """
+        Run agent on thread `idx`. Interrupted run of the thread is resumed from the last checkpoint,
+        the message is added only when the thread has nothing pending.
+        Raises `BudgetExceeded` with chunks received so far when the run is over budget.
         """
+        usage = RunUsage(budget or RunBudget())
         config = {
             "configurable": {
                 "thread_id": str(idx)
             }, 
             "recursion_limit": 50, 
-            "callbacks": [self.langfuse_handler],
+            # budget handler is inherited by generator tools through the run config
+            "callbacks": self.callbacks(idx) + [BudgetCallbackHandler(usage)],
+            "metadata": {
+                "langfuse_session_id": str(idx),
+                "run_id": run_context.get().get("run_id"),
+            },
         }
 
-        message_input = {"messages": [
-            {"role": "user", "content": message}
-            ]}
+        if await self.unfinished(idx):
+            logger.info("Resuming thread from the last checkpoint", extra={"thread_id": str(idx)})
+            message_input = None
+        else:
+            message_input = {"messages": [
+                {"role": "user", "content": message}
+                ]}
 
         chunks = []
-        async for chunk in self.agent.astream(message_input, config=config, durability="async"):
-            print(chunk)
-            chunks.append(chunk)
+        # wall-clock limit also interrupts a step that hangs in LLM or tool call
+        timeout = asyncio.timeout(usage.remaining_seconds())
+        try:
+            async with timeout:
+                async for chunk in self.agent.astream(message_input, config=config, durability="async"):
+                    log_step(chunk)
+                    chunks.append(chunk)
+                    usage.observe(chunk)
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            exceeded = BudgetExceeded(f"wall-clock {usage.elapsed():.0f}s/{usage.budget.max_seconds}s", usage)
+            exceeded.chunks = chunks
+            raise exceeded from None
+        except BudgetExceeded as e:
+            e.chunks = chunks
+            raise
 
         return chunks
 
 
+def log_step(chunk: dict):
+    """
+    Agent step summary without message contents, contents are logged on DEBUG level only.
+    """
+    for node, update in chunk.items():
+        messages = update.get('messages', []) if isinstance(update, dict) else []
+        logger.info("Agent step", extra={
+            "node": node,
+            "tool_calls": [call['name'] for m in messages for call in getattr(m, 'tool_calls', None) or []],
+            "tool_results": [m.name for m in messages if getattr(m, 'type', None) == 'tool'],
+            "tokens": sum((getattr(m, 'usage_metadata', None) or {}).get('total_tokens', 0) for m in messages),
+        })
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Agent step content", extra={"node": node, "content": [m.content for m in messages]})
+
+
 # Agent dependencies    
 _agent = None    
 
@@ -156,7 +290,16 @@ async def build_agent():
         folder=conf.FOLDER, 
         model=conf.MODEL_NAME,
         mcp_configs=json.load(open(conf.MCP_CONFIG,"r")),
-        pg_url=conf.POSTGRESQL_URL
+        pg_url=conf.POSTGRESQL_URL,
+        tool_cache_ttl=conf.MCP_CACHE_TTL,
+        langfuse_options={
+            "public_key": conf.LANGFUSE_PUBLIC_KEY,
+            "secret_key": conf.LANGFUSE_SECRET_KEY,
+            "host": conf.LANGFUSE_HOST,
+            "flush_at": conf.LANGFUSE_FLUSH_AT,
+            "flush_interval": conf.LANGFUSE_FLUSH_INTERVAL,
+        } if conf.LANGFUSE_ENABLED and conf.LANGFUSE_HOST and conf.LANGFUSE_PUBLIC_KEY and conf.LANGFUSE_SECRET_KEY else None,
+        trace_sample_rate=conf.LANGFUSE_SAMPLE_RATE
         )
 
 
@@ -185,11 +328,149 @@ _git = None
 async def build_git():
     global _git
     conf = get_config()
-    _git = GitWorker(gitlab_url=conf.GITLAB_URL, gitlab_token=conf.GITLAB_TOKEN, project_path=conf.PROJECT_PATH)
+    if conf.GIT_BACKEND == 'local':
+        # initial clone runs git subprocesses, keep event loop free
+        _git = await asyncio.to_thread(
+            LocalGitWorker,
+            gitlab_url=conf.GITLAB_URL,
+            gitlab_token=conf.GITLAB_TOKEN,
+            project_path=conf.PROJECT_PATH,
+            workdir=conf.GIT_WORKDIR,
+            sparse_paths=[x.strip() for x in conf.GIT_SPARSE_PATHS.split(',') if x.strip()],
+            fetch_interval=conf.GIT_FETCH_INTERVAL
+        )
+    elif conf.GIT_BACKEND == 'api':
+        _git = GitWorker(gitlab_url=conf.GITLAB_URL, gitlab_token=conf.GITLAB_TOKEN, project_path=conf.PROJECT_PATH)
+    else:
+        raise ValueError(f"Unknown GIT_BACKEND: {conf.GIT_BACKEND}")
 
 def get_git():
     return _git
 
+# Generated files storage
+_artifacts = None
+
+async def build_artifacts():
+    global _artifacts
+    conf = get_config()
+    if not conf.ARTIFACTS_FOLDER and (conf.POSTGRESQL_URL or conf.JOB_QUEUE):
+        # checkpoints outlive the process, handles in them must point to files that outlive it too
+        raise ValueError("ARTIFACTS_FOLDER must be a persistent folder (shared by all workers with JOB_QUEUE) when checkpoints are stored in Postgres")
+    _artifacts = ArtifactStore(folder=conf.ARTIFACTS_FOLDER)
+
+def get_artifacts():
+    return _artifacts
+
+# Issue runs scheduler
+_scheduler = None
+
+async def build_scheduler():
+    global _scheduler
+    conf = get_config()
+    _scheduler = Scheduler(
+        max_concurrency=conf.SCHEDULER_MAX_CONCURRENCY, 
+        project_quota=conf.SCHEDULER_PROJECT_QUOTA, 
+        project_weights=json.loads(conf.SCHEDULER_PROJECT_WEIGHTS)
+    )
+
+def get_scheduler():
+    return _scheduler
+
+
+def get_run_budget(labels: list[str]) -> RunBudget:
+    """
+    Run budget of the issue: global limits from config overridden by its labels.
+    """
+    conf = get_config()
+    defaults = {
+        "max_tokens": conf.RUN_MAX_TOKENS,
+        "max_seconds": conf.RUN_MAX_SECONDS,
+        "max_llm_calls": conf.RUN_MAX_LLM_CALLS,
+        "max_tool_calls": json.loads(conf.RUN_MAX_TOOL_CALLS),
+    }
+    return RunBudget.for_labels(labels, defaults, json.loads(conf.RUN_BUDGET_LABELS))
+
+# Shared job queue
+_jobs = None
+
+async def build_jobs():
+    global _jobs
+    conf = get_config()
+    if conf.JOB_QUEUE and not conf.POSTGRESQL_URL:
+        raise ValueError("JOB_QUEUE requires POSTGRESQL_URL")
+
+    _jobs = await JobQueue.create(
+        conf.POSTGRESQL_URL, 
+        lease=conf.JOB_LEASE_SECONDS, 
+        max_attempts=conf.JOB_MAX_ATTEMPTS, 
+        project_quota=conf.SCHEDULER_PROJECT_QUOTA
+    )
+
+def get_jobs():
+    return _jobs
+
+# Generator templates index
+_templates = None
+
+async def build_templates():
+    global _templates
+    conf = get_config()
+    _templates = TemplateIndex(
+        get_git(), 
+        folder=conf.TEMPLATE_INDEX_FOLDER, 
+        root=conf.TEMPLATE_INDEX_ROOT, 
+        max_age=conf.TEMPLATE_INDEX_MAX_AGE
+    )
+    _templates.load()
+    try:
+        downloaded = await asyncio.to_thread(_templates.refresh)
+    except Exception as e:
+        # generators work without templates, refresh is retried when a generator needs the index
+        logger.warning("Templates index refresh failed, starting with saved index: %s", e)
+        return
+    logger.info("Templates index is ready", extra={"files": len(_templates.entries), "downloaded": downloaded})
+
+def get_templates():
+    return _templates
+
+# Profiling and event loop watchdog
+_profiler = None
+
+async def build_profiler():
+    global _profiler
+    conf = get_config()
+    _profiler = Profiler(
+        folder=conf.PROFILE_FOLDER, 
+        interval=conf.PROFILE_INTERVAL_MS / 1000, 
+        max_seconds=conf.PROFILE_MAX_SECONDS, 
+        stall_threshold=conf.LOOP_STALL_THRESHOLD_MS / 1000
+    )
+
+def get_profiler():
+    return _profiler
+
+# Webhook admission control
+_admission = None
+
+async def build_admission():
+    global _admission
+    conf = get_config()
+    _admission = AdmissionController(
+        secret=conf.WEBHOOK_SECRET,
+        max_body_bytes=conf.WEBHOOK_MAX_BODY_BYTES,
+        rate=conf.WEBHOOK_RATE,
+        burst=conf.WEBHOOK_BURST,
+        max_accepted_runs=conf.ADMISSION_MAX_ACCEPTED_RUNS,
+        max_memory_mb=conf.ADMISSION_MAX_MEMORY_MB,
+        max_loop_lag=conf.ADMISSION_MAX_LOOP_LAG_MS / 1000,
+        retry_after=conf.ADMISSION_RETRY_AFTER
+    )
+
+    if not conf.WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set: webhooks and batch runs are accepted from anyone who can reach the service")
+
+def get_admission():
+    return _admission
 
 
 # Tools
@@ -202,99 +483,247 @@ class FileOutput(BaseModel):
 # Global parser instance
 parser = PydanticOutputParser(pydantic_object=FileOutput)
 
+structured_instructions = "Return the file through the provided `FileOutput` schema."
+
+continue_instructions = "Your reply was cut off. Continue exactly from the last character, do not repeat anything and do not add any text around it."
+
+fields_instructions = """The file content below was generated without its metadata.
+Return only a JSON object with the keys {fields} describing this file.
+
+File name hint: `{file_name}`
+
+```
+{content}
+```"""
+
+# Endpoint, model and method rejecting structured output requests to time of the rejection,
+# structured output is requested again after STRUCTURED_RECHECK_SECONDS (e.g. endpoint was upgraded)
+_structured_unsupported = {}
+STRUCTURED_RECHECK_SECONDS = 3600
+
+# Request parameters used by structured output methods (response_format, tools), and error words about them
+STRUCTURED_PARAMS = ('response_format', 'json_schema', 'json_object', 'tools', 'tool_choice', 'function')
+
+
+def structured_key(model, method: str) -> str:
+    return f"{getattr(model, 'openai_api_base', None)}|{getattr(model, 'model_name', None)}|{method}"
+
+
+def structured_supported(key: str) -> bool:
+    rejected_at = _structured_unsupported.get(key)
+    if rejected_at is None:
+        return True
+    if time.monotonic() - rejected_at > STRUCTURED_RECHECK_SECONDS:
+        del _structured_unsupported[key]
+        return True
+    return False
+
+
+def is_structured_unsupported(e: BadRequestError) -> bool:
+    """
+    Endpoint rejected the structured output parameters themselves, not the request content
+    (context length, content filter and so on).
+    """
+    if getattr(e, 'param', None) in STRUCTURED_PARAMS:
+        return True
+    message = str(getattr(e, 'message', None) or e).lower()
+    return any(name in message for name in STRUCTURED_PARAMS) and any(
+        word in message for word in ('support', 'unknown', 'unrecognized', 'invalid', 'not allowed', 'extra'))
+
+
+def _load_json_object(text: str) -> dict:
+    """
+    Extract the outermost JSON object from model reply.
+    Raw new lines inside strings are accepted (strict=False), models often emit them in code files.
+    """
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1:
+        raise json.JSONDecodeError("JSON object not found", text, 0)
+    
+    return json.loads(text[start:end + 1] if end > start else text[start:], strict=False)
+
+
+async def repair_file_output(text: str, prompt_text: str, inputs: dict, config: RunnableConfig = None) -> FileOutput:
+    """
+    Repair malformed generator reply.
+    Only the broken part is requested from the model again:
+    - truncated JSON: the model continues the reply from the last character
+    - missing fields: the model returns the missing metadata fields only
+    """
+    model = await get_model()
+
+    try:
+        data = _load_json_object(text)
+    except json.JSONDecodeError:
+        chunks = []
+        async for chunk in model.astream([("human", prompt_text), ("ai", text), ("human", continue_instructions)], config=config):
+            chunks.append(chunk.content)
+        text = text + "".join(chunks)
+        data = _load_json_object(text)
+
+    missing = [name for name in FileOutput.model_fields if not data.get(name)]
+    if missing and data.get('content'):
+        reply = await model.ainvoke(fields_instructions.format(
+            fields=", ".join(missing), 
+            file_name=inputs.get('file_name') or inputs.get('dag_id') or '', 
+            content=data['content'][:2000]), config=config)
+        data.update({k: v for k, v in _load_json_object(reply.content).items() if k in missing})
+
+    try:
+        return FileOutput.model_validate(data)
+    except ValidationError as e:
+        raise OutputParserException(f"Failed to repair generator output: {e}", llm_output=text)
+
+
+async def generate_file(template: str, inputs: dict, config: RunnableConfig = None) -> FileOutput:
+    """
+    Generate file with native structured output when the endpoint supports it.
+    Text mode with `FileOutput` format instructions is used as a fallback.
+    Run config of the tool is passed to model calls, so run callbacks (budget, tracing) see them.
+    """
+    conf = get_config()
+    model = await get_model()
+    key = structured_key(model, conf.STRUCTURED_OUTPUT_METHOD)
+
+    if conf.STRUCTURED_OUTPUT and structured_supported(key):
+        prompt = PromptTemplate.from_template(template, partial_variables={"format_instructions": structured_instructions})
+        chain = prompt | model.with_structured_output(FileOutput, method=conf.STRUCTURED_OUTPUT_METHOD)
+        try:
+            res = await chain.ainvoke(inputs, config=config)
+            if res is not None:
+                return res
+        except BadRequestError as e:
+            if is_structured_unsupported(e):
+                logger.warning("Structured output is not supported by endpoint, switching to text mode: %s", e)
+                _structured_unsupported[key] = time.monotonic()
+            else:
+                logger.warning("Structured output request failed, falling back to text mode: %s", e)
+        except (ValidationError, OutputParserException) as e:
+            logger.warning("Structured output failed, falling back to text mode: %s", e)
+
+    prompt = PromptTemplate.from_template(template, partial_variables={"format_instructions": parser.get_format_instructions()})
+    prompt_text = prompt.format(**inputs)
+    text = await (model | StrOutputParser()).ainvoke(prompt_text, config=config)
+
+    try:
+        return parser.parse(text)
+    except OutputParserException:
+        return await repair_file_output(text, prompt_text, inputs, config)
+
+
+async def find_template(kind: str, query: str) -> str:
+    """
+    Best matching project file of the kind to use as generator template.
+    """
+    templates = get_templates()
+    if templates is None:
+        return ""
+    return await asyncio.to_thread(templates.best_template, kind, query)
+
+
+def config_thread_id(config: RunnableConfig) -> str:
+    return (config or {}).get("configurable", {}).get("thread_id", "default")
+
+
+def missing_artifact(e: ArtifactNotFound) -> dict[str, Any]:
+    """
+    Tool result for a handle whose files are lost, the agent regenerates the file with the generator tool.
+    """
+    return {
+        "success": False, 
+        "error": f"{e}. Call the generate_* tool that returned it again with the same arguments to regenerate the file and use the new artifact id."
+    }
+
+
+async def generate_artifact(kind: str, template: str, inputs: dict, config: RunnableConfig) -> dict[str, Any]:
+    """
+    Generate file, spool it to the artifact store and return its handle with metadata only.
+    File generated with the same inputs in this thread is reused, e.g. when interrupted run is resumed.
+    """
+    thread_id = config_thread_id(config)
+    artifacts = get_artifacts()
+
+    inputs_hash = hashlib.sha256(json.dumps([kind, template, inputs], sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    existing = artifacts.find(thread_id, inputs_hash=inputs_hash)
+    if existing:
+        return {**existing, "reused": True}
+
+    output = await generate_file(template, inputs, config)
+
+    return artifacts.stage(
+        thread_id=thread_id, 
+        kind=kind, 
+        filename=output.filename, 
+        content=output.content, 
+        description=output.description, 
+        commit_message=output.commit_message,
+        inputs_hash=inputs_hash
+    )
+
+
 @tool
 async def generate_task_file(
     file_name:str = Field(..., description="Apache Spark application file name"),
     task_requirements:str = Field(..., description="Task requirements to generate file, source schemas, data structures, transformation requirements, target table name, environment variables, config parameters"),
-    task_template:str = Field(..., description="Proper pyspark template and usefull snippets")
-    ) -> FileOutput:
+    task_template:str = Field("", description="Proper pyspark template and usefull snippets. Leave empty to use the best matching task of the project"),
+    config: RunnableConfig = None
+    ) -> dict[str, Any]:
     """
     This tool is for generating Apache Spark applications for ETL processes
     """
-    prompt = PromptTemplate(
-        template=task_prompt,
-        input_variables=['file_name', 'task_requirements', 'task_template'],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-    
-    model = await get_model()
-    
-    chain = prompt | model | parser
-
-    return await chain.ainvoke({"file_name": file_name, "task_requirements": task_requirements, "task_template": task_template})
+    task_template = task_template or await find_template("task", f"{file_name} {task_requirements}")
+    return await generate_artifact("task", task_prompt, {"file_name": file_name, "task_requirements": task_requirements, "task_template": task_template}, config)
 
 
 @tool
 async def generate_dq_task_file(
     file_name:str = Field(..., description="Apache Spark application file name"),
     task_requirements:str = Field(..., description="Task requirements to generate file"),
-    dq_task_template:str = Field(..., description="Proper pyspark application template and usefull snippets, target table structure, required environment variables"),
-    generated_task:str = Field(..., description="Code of generated etl task.")
-    ) -> FileOutput:
+    dq_task_template:str = Field("", description="Proper pyspark application template and usefull snippets, target table structure, required environment variables. Leave empty to use the best matching data quality task of the project"),
+    generated_task:str = Field(..., description="Artifact id or code of generated etl task."),
+    config: RunnableConfig = None
+    ) -> dict[str, Any]:
     """
     This tool is for generating Apache Spark applications for data quality check tasks
     """
-    prompt = PromptTemplate(
-        template=dq_prompt,
-        input_variables=['file_name', 'task_requirements', 'task_template', "generated_task"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-    
-    model = await get_model()
-    
-    chain = prompt | model | parser
-
-    return await chain.ainvoke({"file_name": file_name, "task_requirements": task_requirements, "dq_task_template": dq_task_template, "generated_task": generated_task})
+    try:
+        generated_task = get_artifacts().resolve(generated_task, config_thread_id(config))
+    except ArtifactNotFound as e:
+        return missing_artifact(e)
+    dq_task_template = dq_task_template or await find_template("dq", f"{file_name} {task_requirements}")
+    return await generate_artifact("dq", dq_prompt, {"file_name": file_name, "task_requirements": task_requirements, "dq_task_template": dq_task_template, "generated_task": generated_task}, config)
 
 
 
 @tool
 async def generate_dag_file(
     dag_id:str = Field(..., description="Airflow DAG id and DAG file name."),
-    dag_requirements:str = Field("Airflow DAG requirements specification"), 
-    dag_template:str = Field("Airflow DAG template to provide same code generation"),
-    generation_instructions:str = Field("Generation instructions, source and destination sources metadata, ")                     
-    ) -> FileOutput:
+    dag_requirements:str = Field(..., description="Airflow DAG requirements specification"), 
+    dag_template:str = Field("", description="Airflow DAG template to provide same code generation. Leave empty to use the best matching DAG of the project"),
+    generation_instructions:str = Field(..., description="Generation instructions, source and destination sources metadata, "),
+    config: RunnableConfig = None
+    ) -> dict[str, Any]:
     """
     This tool is for generating Airflow DAG file based on requirements and generation instructions.
     """
-
-    prompt = PromptTemplate(
-        template=dag_prompt,
-        input_variables=['dag_id', 'dag_requirements', 'dag_template', 'generation_instructions'],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-    
-    model = await get_model()
-    
-    chain = prompt | model | parser
-
-    return await chain.ainvoke({"dag_id": dag_id, "dag_requirements": dag_requirements, "dag_template": dag_template, "generation_instructions": generation_instructions})
+    dag_template = dag_template or await find_template("dag", f"{dag_id} {dag_requirements} {generation_instructions}")
+    return await generate_artifact("dag", dag_prompt, {"dag_id": dag_id, "dag_requirements": dag_requirements, "dag_template": dag_template, "generation_instructions": generation_instructions}, config)
 
 
 @tool
 async def generate_ddl_file(
     file_name:str = Field(..., description="DDL file name."),
-    source_ddl:str = Field("Source ddl specification"), 
-    ddl_template:str = Field("Apache spark ddl template"),
-    additional_instructions:str = Field("Generate instructions")                     
-    ) -> FileOutput:
+    source_ddl:str = Field(..., description="Source ddl specification"), 
+    ddl_template:str = Field("", description="Apache spark ddl template. Leave empty to use the best matching DDL of the project"),
+    additional_instructions:str = Field(..., description="Generate instructions"),
+    config: RunnableConfig = None
+    ) -> dict[str, Any]:
     """
     This tool is for generating Apache Spark DDL file based on source ddl, ddl template and additional instructions.
     """
-    parser = PydanticOutputParser(pydantic_object=FileOutput)
-
-    prompt = PromptTemplate(
-        template=ddl_prompt,
-        input_variables=['file_name', 'source_ddl', 'ddl_template', 'additional_instructions'],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-    
-    model = await get_model()
-    
-    chain = prompt | model | parser
-
-    return await chain.ainvoke({"filename": file_name, "source_ddl": source_ddl, "ddl_template": ddl_template, "additional_instructions": additional_instructions})
+    ddl_template = ddl_template or await find_template("ddl", f"{file_name} {additional_instructions}")
+    return await generate_artifact("ddl", ddl_prompt, {"file_name": file_name, "source_ddl": source_ddl, "ddl_template": ddl_template, "additional_instructions": additional_instructions}, config)
 
 
 @tool
@@ -302,25 +731,18 @@ async def generate_doc_file(
     file_name:str = Field(..., description="Documentation file name."),
     file_context:str = Field(..., description="Documentatiln context"),
     additional_instructions:str = Field(..., description="Generate instructions"),
-    dag_file:str = Field(..., description="Generated DAG file")                 
-    ) -> FileOutput:
+    dag_file:str = Field(..., description="Artifact id or content of generated DAG file"),
+    config: RunnableConfig = None
+    ) -> dict[str, Any]:
     """
     This tool is for generating documentation file based on provided context, Airflow DAG file and additional instructions.
     Use this tool to generate SRS (Software requirements Spce.), README or any another text documents.
     """
-    parser = PydanticOutputParser(pydantic_object=FileOutput)
-
-    prompt = PromptTemplate(
-        template=doc_prompt,
-        input_variables=['file_name', 'file_context', 'additional_instructions', 'dag_file'],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-    
-    model = await get_model()
-    
-    chain = prompt | model | parser
-
-    return await chain.ainvoke({"file_name": file_name, "file_context": file_context, "additional_instructions": additional_instructions, "dag_file": dag_file})
+    try:
+        dag_file = get_artifacts().resolve(dag_file, config_thread_id(config))
+    except ArtifactNotFound as e:
+        return missing_artifact(e)
+    return await generate_artifact("doc", doc_prompt, {"file_name": file_name, "file_context": file_context, "additional_instructions": additional_instructions, "dag_file": dag_file}, config)
 
 
 @tool
@@ -340,16 +762,31 @@ async def create_branch(
 @tool
 async def commit_file(
     branch_name:str = Field(..., description="Gitlab branch name"),
-    filename:str = Field(..., description="File name with path"),
-    filecontent:str = Field(..., description="File content"),
-    task_title:str = Field(..., description="Task title for commit message")
+    task_title:str = Field(..., description="Task title for commit message"),
+    artifact_id:str = Field(None, description="Artifact id returned by generate_* tool"),
+    filename:str = Field(None, description="File name with path, artifact file name is used by default"),
+    filecontent:str = Field(None, description="File content, only for files not generated by generate_* tools"),
+    config: RunnableConfig = None
     ) -> dict[str, Any]:
     """
-    This tool is for executing `git commit` action in provided branch
+    This tool is for executing `git commit` action in provided branch.
+    Pass `artifact_id` for generated files instead of the file content.
     """
     git = get_git()
+    artifacts = get_artifacts()
+
+    if artifact_id:
+        # only artifacts staged by this run can be committed
+        thread_id = config_thread_id(config)
+        try:
+            filename = filename or artifacts.meta(artifact_id, thread_id).get('filename')
+            filecontent = artifacts.read(artifact_id, thread_id)
+        except ArtifactNotFound as e:
+            return {"task": task_title, **missing_artifact(e)}
 
     res = git.gitlab_commit_file(branch_name=branch_name, filename=filename, filecontent=filecontent, task=task_title)
 
-    return res
+    if artifact_id and res.get('success'):
+        artifacts.update_meta(artifact_id, committed=True, branch_name=branch_name)
 
+    return res
@@ -0,0 +1,167 @@
+import os
+import time
+import signal
+import socket
+import asyncio
+import logging
+
+from src.jobs import JobQueue
+from src.tasks import ISSUE_TASKS
+from src.logs import bind
+
+
+logger = logging.getLogger(__name__)
+
+
+class AgentWorker():
+    """
+    Stateless agent worker: claims jobs from the shared Postgres queue and runs them.
+    Agent state lives in the Postgres checkpointer, so any replica can take over a job with expired lease.
+    """
+    def __init__(self, queue:JobQueue, agent, git, concurrency:int=1, heartbeat:int=30, poll:float=2.0):
+        self.queue = queue
+        self.agent = agent
+        self.git = git
+        self.concurrency = concurrency
+        self.heartbeat = heartbeat
+        self.poll = poll
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._running = set()
+        self._stopping = asyncio.Event()
+
+
+    def stop(self):
+        logger.info("Worker %s is stopping, waiting for %d running jobs", self.owner, len(self._running))
+        self._stopping.set()
+
+
+    async def _keep_lease(self, job:dict, task:asyncio.Task):
+        """
+        Extend the job lease every `heartbeat` seconds. Failed heartbeats (database not available) are retried
+        more often; the run is cancelled when the lease is lost or can not be confirmed before it expires.
+        """
+        retry = max(min(self.heartbeat / 5, 5), 1)
+        expires = time.monotonic() + self.queue.lease
+        wait = self.heartbeat
+        while not task.done():
+            await asyncio.sleep(wait)
+            sent = time.monotonic()
+            try:
+                # hanging connection counts as a failed heartbeat
+                owned = await asyncio.wait_for(self.queue.heartbeat(job['id'], self.owner), timeout=self.heartbeat)
+            except Exception as e:
+                if time.monotonic() + retry >= expires:
+                    logger.warning("Job lease can not be confirmed, cancelling: %s", e)
+                    task.cancel()
+                    return
+                logger.warning("Job heartbeat failed, retrying in %.0fs: %s", retry, e)
+                wait = retry
+                continue
+
+            if not owned:
+                logger.warning("Job lease is lost, cancelling")
+                task.cancel()
+                return
+            expires = sent + self.queue.lease
+            wait = self.heartbeat
+
+
+    async def _process(self, job:dict):
+        func = ISSUE_TASKS[job['kind']]
+        # the run task inherits job fields in its log context
+        bind(job_id=job['id'], issue_id=job['issue_id'])
+        task = asyncio.create_task(func(job['payload'], self.agent, self.git))
+        lease = asyncio.create_task(self._keep_lease(job, task))
+        try:
+            await task
+            await self.queue.complete(job['id'], self.owner)
+            logger.info("Job %s is done", job['kind'])
+        except asyncio.CancelledError:
+            # lease lost, job is already owned by another worker
+            pass
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job['kind'], e)
+            await self.queue.fail(job['id'], self.owner, repr(e))
+        finally:
+            lease.cancel()
+
+
+    async def run(self):
+        logger.info("Worker %s started, concurrency: %d", self.owner, self.concurrency)
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            job = await self.queue.claim(self.owner)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._process(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        if self._running:
+            await asyncio.wait(self._running)
+        logger.info("Worker %s finished", self.owner)
+
+
+def toggle_profile(profiler):
+    """
+    Runs of the job queue are executed by workers, admin endpoints of the API process can not sample them.
+    `kill -USR1 <worker pid>` starts a whole process profile for PROFILE_MAX_SECONDS, the next signal stops it.
+    """
+    if profiler.session and profiler.session.running:
+        asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+        return
+    res = profiler.start(duration=profiler.max_seconds)
+    logger.info("Profiling started, profile is saved to %s", profiler.folder, extra=res)
+
+
+async def main():
+    from src.utils import get_config, build_agent, build_model, build_git, build_artifacts, build_jobs, build_templates, build_profiler
+    from src.utils import get_agent, get_git, get_jobs, get_profiler, init_logging
+
+    conf = get_config()
+    init_logging()
+    # stalls of the worker loop are logged, SIGUSR1 starts or stops a sampling profile of the worker
+    await build_profiler()
+
+    await build_agent()
+    await build_model()
+    await build_git()
+    await build_artifacts()
+    await build_jobs()
+    # workers have no push webhook, index is synced by blob ids every TEMPLATE_INDEX_MAX_AGE seconds
+    await build_templates()
+
+    worker = AgentWorker(
+        queue=get_jobs(),
+        agent=get_agent(),
+        git=get_git(),
+        concurrency=conf.WORKER_CONCURRENCY,
+        heartbeat=conf.JOB_HEARTBEAT_SECONDS
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    loop.add_signal_handler(signal.SIGUSR1, toggle_profile, get_profiler())
+
+    try:
+        await worker.run()
+    finally:
+        await get_jobs().close()
+        get_profiler().close()
+
+
+if __name__ == '__main__':
+    """
+    Agent worker: `python -m src.worker`, run as many replicas as needed.
+    """
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import pytest
+
+from src import admission
+from src.admission import AdmissionController, RateLimiter, RequestRejected, check_token
+
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_check_token():
+    assert check_token(None, None)
+    assert check_token("secret", "secret")
+    assert not check_token("other", "secret")
+    assert not check_token(None, "secret")
+    assert not check_token("", "secret")
+
+
+def test_rate_limiter_burst_and_refill(clock):
+    limiter = RateLimiter(rate=2.0, burst=3)
+    assert [limiter.acquire("gitlab") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("gitlab") == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert limiter.acquire("gitlab") == 0
+    # bucket does not grow above burst while idle
+    clock.now += 60
+    assert [limiter.acquire("gitlab") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("gitlab") > 0
+
+
+def test_rate_limiter_buckets_per_source(clock):
+    limiter = RateLimiter(rate=1.0, burst=1, max_sources=2)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+    # least recently seen source is forgotten and starts with a full bucket
+    limiter.acquire("c")
+    assert limiter.acquire("a") == 0
+
+
+def reject(call, *args, **kwargs) -> RequestRejected:
+    with pytest.raises(RequestRejected) as e:
+        call(*args, **kwargs)
+    return e.value
+
+
+def test_check_request(clock):
+    controller = AdmissionController(secret="secret", max_body_bytes=100, rate=1.0, burst=1)
+
+    assert reject(controller.check_request, "gitlab", "wrong", "10").status == 401
+    assert reject(controller.check_request, "gitlab", "secret", "101").status == 413
+
+    controller.check_request("gitlab", "secret", "10")
+    # pushes do not take tokens of the source
+    controller.check_request("gitlab", "secret", "10", rate_limit=False)
+    e = reject(controller.check_request, "gitlab", "secret", "10")
+    assert (e.status, e.retry_after) == (429, pytest.approx(1.0))
+
+    assert controller.stats()["rejected"] == {"invalid token": 1, "body too large": 1, "rate limited": 1}
+
+
+def test_check_body_size():
+    controller = AdmissionController(max_body_bytes=100)
+    controller.check_body_size(100)
+    assert reject(controller.check_body_size, 101).status == 413
+
+
+def test_check_load():
+    controller = AdmissionController(max_accepted_runs=10, max_loop_lag=1.0, retry_after=30)
+    controller.check_load(accepted_runs=9, loop_lag=0.5)
+    # not checked when the value is unknown (job queue mode)
+    controller.check_load(accepted_runs=None)
+
+    e = reject(controller.check_load, accepted_runs=10)
+    assert (e.status, e.reason, e.retry_after) == (503, "too many runs", 30)
+    assert reject(controller.check_load, loop_lag=1.0).reason == "event loop lag"
+
+
+def test_check_load_disabled():
+    AdmissionController(max_accepted_runs=0, max_loop_lag=0).check_load(accepted_runs=10**6, loop_lag=10**6)
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from src.artifacts import ArtifactStore, ArtifactNotFound
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def stage(store, thread_id="5", content="print(1)\n") -> dict:
+    return store.stage(thread_id, "dag", "dags/orders.py", content, "orders DAG", "add orders DAG")
+
+
+def test_stage_and_read(store):
+    meta = stage(store)
+    assert meta["artifact_id"].startswith("artifact:5/")
+    assert (meta["size"], meta["lines"]) == (9, 2)
+    assert store.read(meta["artifact_id"], "5") == "print(1)\n"
+    # the model may add spaces around the handle
+    assert store.resolve(f" {meta['artifact_id']}\n", "5") == "print(1)\n"
+    assert store.resolve("plain content", "5") == "plain content"
+
+    store.update_meta(meta["artifact_id"], committed=True)
+    assert store.find("5", filename="dags/orders.py")["committed"] is True
+    assert store.find("5", filename="dags/other.py") is None
+
+
+@pytest.mark.parametrize("handle", [
+    "artifact:../0123456789abcdef0123456789abcdef",
+    "artifact:./0123456789abcdef0123456789abcdef",
+    "artifact:5/../../etc/passwd",
+    "artifact:5/0123456789abcdef0123456789abcdef/../x",
+    "artifact:5/0123456789ABCDEF0123456789ABCDEF",
+    "artifact:/etc/0123456789abcdef0123456789abcdef",
+    "artifact:5\n/0123456789abcdef0123456789abcdef",
+    "/etc/passwd",
+])
+def test_invalid_handles_are_rejected(store, handle):
+    stage(store)
+    with pytest.raises(ValueError):
+        store.read(handle)
+    with pytest.raises(ValueError):
+        store.meta(handle)
+
+
+def test_handles_of_other_threads_are_rejected(store):
+    meta = stage(store, thread_id="6")
+    with pytest.raises(ValueError):
+        store.read(meta["artifact_id"], "5")
+    assert store.read(meta["artifact_id"]) == "print(1)\n"
+
+
+def test_symlinked_thread_folder_is_rejected(store, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    os.symlink(outside, os.path.join(store.folder, "7"))
+    with pytest.raises(ValueError):
+        store.read("artifact:7/0123456789abcdef0123456789abcdef")
+
+
+def test_missing_artifact(store):
+    meta = stage(store)
+    store.cleanup("5")
+    assert store.list("5") == []
+    with pytest.raises(ArtifactNotFound) as e:
+        store.read(meta["artifact_id"], "5")
+    assert e.value.artifact_id == meta["artifact_id"]
+    with pytest.raises(ArtifactNotFound):
+        store.meta(meta["artifact_id"], "5")
+
+
+def test_manifest_survives_cleanup(store):
+    assert store.load_manifest(5) is None
+    store.save_manifest(5, {"branch_name": "issue-5"})
+    store.cleanup("5")
+    assert store.load_manifest("5") == {"branch_name": "issue-5"}
+    assert not os.path.exists(store._manifest_path(5) + ".tmp")
@@ -0,0 +1,71 @@
+import asyncio
+
+from src import batch
+from src.batch import collect_issues, run_batch, source_key
+from src.scheduler import Scheduler
+
+
+def description(database:str, table:str) -> str:
+    return f"Copy table\n| Parameter | Value |\n|---|---|\n| source_database | {database} |\n| source_table | {table} |\n"
+
+
+class FakeGit():
+    def __init__(self, issues:list[tuple]):
+        self.issues = issues
+        self.listed = 0
+
+    def list_open_issues(self, labels=None):
+        for iid, database, table in self.issues:
+            self.listed += 1
+            yield iid, database, table
+
+    def issue_payload(self, issue) -> dict:
+        iid, database, table = issue
+        return {
+            "project": {"id": 1},
+            "object_attributes": {"id": 1000 + iid, "iid": iid, "title": f"issue {iid}", "description": description(database, table), "labels": []},
+        }
+
+
+def test_source_key():
+    assert source_key(description("pg://orders", "customers")) == ("pg://orders", "customers")
+    assert source_key("no table") == ("", "")
+
+
+def test_collect_issues_groups_by_source_table():
+    git = FakeGit([(1, "pg://a", "orders"), (2, "pg://b", "users"), (3, "pg://a", "customers"), (4, "pg://a", "orders")])
+    payloads = collect_issues(git)
+    assert [x["object_attributes"]["iid"] for x in payloads] == [3, 1, 4, 2]
+
+
+def test_collect_issues_stops_at_limit():
+    git = FakeGit([(n, "pg://a", "orders") for n in range(10)])
+    assert len(collect_issues(git, limit=3)) == 3
+    # pages after the limit are not requested
+    assert git.listed == 3
+
+
+def test_run_batch_limits_concurrency(monkeypatch):
+    running, max_running, done = set(), [0], []
+
+    async def process_issue_task(payload, agent, git):
+        iid = payload["object_attributes"]["iid"]
+        running.add(iid)
+        max_running[0] = max(max_running[0], len(running))
+        await asyncio.sleep(0.01)
+        running.discard(iid)
+        if iid == 2:
+            raise RuntimeError("failed issue")
+        done.append(iid)
+
+    monkeypatch.setattr(batch, "process_issue_task", process_issue_task)
+    payloads = collect_issues(FakeGit([(n, "pg://a", f"t{n}") for n in range(6)]))
+
+    async def main():
+        scheduler = Scheduler(max_concurrency=10, project_quota=10)
+        await run_batch(payloads, None, None, scheduler, concurrency=2)
+
+    asyncio.run(main())
+    # a failed issue does not stop the batch
+    assert sorted(done) == [0, 1, 3, 4, 5]
+    assert max_running[0] == 2
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import budget
+from src.budget import BudgetCallbackHandler, BudgetExceeded, RunBudget, RunUsage, llm_usage
+
+
+def result(usage_metadata=None, token_usage=None):
+    """
+    LLM result as passed to `on_llm_end`.
+    """
+    generation = SimpleNamespace(message=SimpleNamespace(usage_metadata=usage_metadata))
+    return SimpleNamespace(generations=[[generation]], llm_output={"token_usage": token_usage} if token_usage else None)
+
+
+def step(*tool_names) -> dict:
+    """
+    Agent step of the stream requesting tool calls.
+    """
+    return {"agent": {"messages": [SimpleNamespace(tool_calls=[{"name": name} for name in tool_names])]}}
+
+
+def test_llm_usage():
+    assert llm_usage(result({"input_tokens": 10, "output_tokens": 5, "total_tokens": 15})) == \
+        {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+    assert llm_usage(result(token_usage={"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10})) == \
+        {"input_tokens": 7, "output_tokens": 3, "total_tokens": 10}
+    assert llm_usage(result()) == {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+def test_label_budgets_take_the_smallest_limit():
+    defaults = {"max_tokens": 1000, "max_seconds": 600, "max_tool_calls": {"*": 10, "commit_file": 20}}
+    labels = {
+        "sandbox": {"max_tokens": 300, "max_tool_calls": {"commit_file": 5}},
+        "small": {"max_tokens": 500, "max_llm_calls": 3, "max_tool_calls": {"commit_file": 8}},
+    }
+    run_budget = RunBudget.for_labels(["sandbox", "small", "other"], defaults, labels)
+    assert (run_budget.max_tokens, run_budget.max_seconds, run_budget.max_llm_calls) == (300, 600, 3)
+    assert run_budget.tool_limit("commit_file") == 5
+    assert run_budget.tool_limit("read_file") == 10
+
+    assert RunBudget.for_labels([], defaults, labels).max_tokens == 1000
+
+
+def test_token_budget_stops_after_the_call_passing_it():
+    usage = RunUsage(RunBudget(max_tokens=100))
+    handler = BudgetCallbackHandler(usage)
+    handler.on_llm_end(result({"input_tokens": 40, "output_tokens": 20, "total_tokens": 60}))
+    with pytest.raises(BudgetExceeded) as e:
+        handler.on_llm_end(result({"input_tokens": 40, "output_tokens": 20, "total_tokens": 60}))
+    assert e.value.reason == "tokens 120/100"
+    assert (usage.llm_calls, usage.input_tokens, usage.output_tokens) == (2, 80, 40)
+
+    # the exceeded budget is raised again on the next step if a tool swallowed it
+    with pytest.raises(BudgetExceeded) as again:
+        usage.observe(step())
+    assert again.value is e.value
+
+
+def test_llm_calls_budget():
+    usage = RunUsage(RunBudget(max_llm_calls=2))
+    usage.record_llm({})
+    usage.record_llm({})
+    with pytest.raises(BudgetExceeded, match="LLM calls 3/2"):
+        usage.record_llm({})
+
+
+def test_tool_calls_are_checked_before_they_run():
+    usage = RunUsage(RunBudget(max_tool_calls={"commit_file": 2, "*": 0}))
+    usage.observe(step("commit_file", "read_file"))
+    # the step requesting two more calls is stopped as a whole
+    with pytest.raises(BudgetExceeded, match="`commit_file` calls 3/2"):
+        usage.observe(step("commit_file", "commit_file"))
+    assert usage.tool_calls == {"commit_file": 1, "read_file": 1}
+
+
+def test_wall_clock_budget(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(budget.time, "monotonic", lambda: now[0])
+    usage = RunUsage(RunBudget(max_seconds=60))
+    now[0] += 30
+    usage.observe(step())
+    assert usage.remaining_seconds() == 30
+    now[0] += 31
+    with pytest.raises(BudgetExceeded, match="wall-clock 61s/60s"):
+        usage.observe(step())
+    assert usage.remaining_seconds() == 0
+
+
+def test_unlimited_budget():
+    usage = RunUsage(RunBudget())
+    for _ in range(100):
+        usage.record_llm({"total_tokens": 10**6})
+        usage.observe(step("commit_file"))
+    assert usage.remaining_seconds() is None
+    assert "LLM calls: 100" in usage.summary()
@@ -0,0 +1,77 @@
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src import utils
+from src.api.hooks import router
+from src.admission import AdmissionController
+
+
+class FakeScheduler():
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args, **kwargs):
+        self.submitted.append((func.__name__, kwargs))
+
+    def inflight(self) -> int:
+        return len(self.submitted)
+
+
+def provide(value):
+    # dependency without parameters, FastAPI reads parameters of overrides from the request
+    return lambda: value
+
+
+@pytest.fixture
+def scheduler():
+    return FakeScheduler()
+
+
+@pytest.fixture
+def client(scheduler):
+    app = FastAPI()
+    app.include_router(router)
+    admission = AdmissionController(secret="secret", max_body_bytes=10000, rate=1.0, burst=2, max_accepted_runs=10)
+    for dependency, value in {
+        utils.get_admission: admission, utils.get_scheduler: scheduler,
+        utils.get_agent: None, utils.get_git: None, utils.get_jobs: None, utils.get_profiler: None,
+    }.items():
+        app.dependency_overrides[dependency] = provide(value)
+    return TestClient(app)
+
+
+def issue(action="open") -> dict:
+    return {"object_kind": "issue", "project": {"id": 1}, "object_attributes": {"id": 1005, "iid": 5, "action": action, "labels": []}}
+
+
+def post(client, token="secret", event="Issue Hook", body=None):
+    headers = {"X-Gitlab-Token": token} if token else {}
+    if event:
+        headers["X-Gitlab-Event"] = event
+    return client.post("/process_issue", json=body or issue(), headers=headers)
+
+
+def test_issue_is_scheduled(client, scheduler):
+    res = post(client)
+    assert (res.status_code, res.text) == (200, "Issue in process")
+    assert scheduler.submitted[0][1]["key"] == (1, 5)
+
+
+def test_token_is_checked_before_the_event_filter(client, scheduler):
+    # a forged event header does not answer without the token
+    assert post(client, token=None, event="Push Hook").status_code == 401
+    assert post(client, token="wrong", event="Push Hook").status_code == 401
+    assert post(client, event="Push Hook").text == "Ignored"
+    assert scheduler.submitted == []
+
+
+def test_ignored_events_do_not_take_rate(client):
+    for _ in range(5):
+        assert post(client, event="Note Hook").text == "Ignored"
+    assert post(client).status_code == 200
+
+
+def test_rate_limit(client):
+    assert [post(client).status_code for _ in range(3)] == [200, 200, 429]
@@ -0,0 +1,124 @@
+"""
+Job queue tests need a throwaway Postgres database, table `agent_jobs` is truncated:
+TEST_POSTGRESQL_URL=postgresql://postgres@localhost/agent_test pytest tests/test_jobs.py
+"""
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+
+from src.jobs import JobQueue
+
+
+PG_URL = os.environ.get("TEST_POSTGRESQL_URL")
+
+pytestmark = pytest.mark.skipif(not PG_URL, reason="TEST_POSTGRESQL_URL is not set")
+
+
+def run(test):
+    """
+    Run the test coroutine with a fresh queue over an empty table.
+    """
+    async def main():
+        queue = await JobQueue.create(PG_URL, lease=60, max_attempts=2, project_quota=1)
+        try:
+            async with queue.pool.connection() as conn:
+                await conn.execute("TRUNCATE agent_jobs")
+            await test(queue)
+        finally:
+            await queue.close()
+    asyncio.run(main())
+
+
+async def expire_leases(queue:JobQueue):
+    async with queue.pool.connection() as conn:
+        await conn.execute("UPDATE agent_jobs SET lease_expires_at = now() - interval '1 second' WHERE status = 'running'")
+
+
+def test_enqueue_deduplicates_active_jobs():
+    async def test(queue):
+        job_id = await queue.enqueue({"n": 1}, project_id=1, issue_id=5)
+        assert job_id is not None
+        assert await queue.enqueue({"n": 2}, project_id=1, issue_id=5) is None
+        # another kind of the same issue is a separate job
+        assert await queue.enqueue({"n": 3}, kind='issue_update', project_id=1, issue_id=5) is not None
+
+        job = await queue.claim("w1")
+        await queue.complete(job["id"], "w1")
+        assert await queue.enqueue({"n": 4}, project_id=1, issue_id=5) is not None
+    run(test)
+
+
+def test_claim_by_priority():
+    async def test(queue):
+        queue.project_quota = 10
+        await queue.enqueue({}, priority='low', project_id=1, issue_id=1)
+        await queue.enqueue({}, priority='high', project_id=1, issue_id=2)
+        await queue.enqueue({}, priority='normal', project_id=1, issue_id=3)
+
+        claimed = [(await queue.claim("w1"))["issue_id"] for _ in range(3)]
+        assert claimed == ["2", "3", "1"]
+        assert await queue.claim("w1") is None
+    run(test)
+
+
+def test_concurrent_claims_keep_project_quota():
+    async def test(queue):
+        for issue_id in range(4):
+            await queue.enqueue({}, project_id=1, issue_id=issue_id)
+        await queue.enqueue({}, project_id=2, issue_id=1)
+
+        jobs = await asyncio.gather(*(queue.claim(f"w{i}") for i in range(4)))
+        claimed = sorted(job["project_id"] for job in jobs if job)
+        assert claimed == ["1", "2"]
+    run(test)
+
+
+def test_update_waits_for_the_full_run():
+    async def test(queue):
+        queue.project_quota = 10
+        await queue.enqueue({}, project_id=1, issue_id=5)
+        full = await queue.claim("w1")
+        await queue.enqueue({}, kind='issue_update', project_id=1, issue_id=5)
+
+        assert await queue.claim("w2") is None
+        await queue.complete(full["id"], "w1")
+        assert (await queue.claim("w2"))["kind"] == 'issue_update'
+    run(test)
+
+
+def test_expired_lease_is_taken_over():
+    async def test(queue):
+        await queue.enqueue({}, project_id=1, issue_id=5)
+        job = await queue.claim("w1")
+        assert await queue.heartbeat(job["id"], "w1")
+
+        await expire_leases(queue)
+        taken = await queue.claim("w2")
+        assert (taken["id"], taken["attempts"], taken["lease_owner"]) == (job["id"], 2, "w2")
+        # the previous owner lost the lease and can not finish the job
+        assert not await queue.heartbeat(job["id"], "w1")
+
+        # attempts are exhausted, the job fails instead of being claimed again
+        await expire_leases(queue)
+        assert await queue.claim("w3") is None
+        async with queue.pool.connection() as conn:
+            cur = await conn.execute("SELECT status FROM agent_jobs WHERE id = %s", (job["id"],))
+            assert (await cur.fetchone())["status"] == 'failed'
+    run(test)
+
+
+def test_failed_job_is_retried():
+    async def test(queue):
+        await queue.enqueue({}, project_id=1, issue_id=5)
+        job = await queue.claim("w1")
+        await queue.fail(job["id"], "w1", "boom")
+        retried = await queue.claim("w2")
+        assert (retried["id"], retried["error"]) == (job["id"], "boom")
+
+        await queue.fail(retried["id"], "w2", "boom")
+        assert await queue.claim("w3") is None
+    run(test)
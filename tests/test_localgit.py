@@ -0,0 +1,121 @@
+import os
+import subprocess
+
+import pytest
+
+from src.localgit import LocalRepository
+
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@localhost",
+    "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@localhost",
+}
+
+
+def git(*args, cwd=None) -> str:
+    res = subprocess.run(["git", *args], cwd=cwd, env={**os.environ, **GIT_ENV}, capture_output=True, text=True, check=True)
+    return res.stdout.strip()
+
+
+def write(root, path:str, content:str):
+    full_path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """
+    Bare repository served over file:// (shallow and partial clone are not used for plain paths),
+    and a seed clone to push commits from.
+    """
+    bare = str(tmp_path / "remote.git")
+    git("init", "--bare", "--initial-branch=main", bare)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=bare)
+
+    seed = str(tmp_path / "seed")
+    git("clone", bare, seed)
+    git("checkout", "-B", "main", cwd=seed)
+    write(seed, "dags/load_orders.py", "# orders DAG\n")
+    write(seed, "dags/sql/orders.sql", "select 1\n")
+    write(seed, "docs/README.md", "# docs\n")
+    git("add", "-A", cwd=seed)
+    git("commit", "-m", "initial", cwd=seed)
+    git("push", "origin", "main", cwd=seed)
+
+    return {"url": f"file://{bare}", "bare": bare, "seed": seed}
+
+
+@pytest.fixture
+def repo(remote, tmp_path):
+    return LocalRepository(remote["url"], workdir=str(tmp_path / "work"), sparse_paths=["dags"], fetch_interval=3600)
+
+
+def test_sparse_clone(repo):
+    assert os.path.isfile(os.path.join(repo.path, "dags", "load_orders.py"))
+    assert not os.path.exists(os.path.join(repo.path, "docs"))
+    assert git("rev-parse", "--is-shallow-repository", cwd=repo.path) == "true"
+
+
+def test_read_inside_and_outside_sparse_paths(repo):
+    assert repo.read("dags/load_orders.py") == "# orders DAG\n"
+    # fetched on demand from the promisor remote
+    assert repo.read("/docs/README.md") == "# docs\n"
+    assert repo.read("dags/missing.py") is None
+
+
+def test_commits_are_pushed_at_once(repo, remote):
+    branch_name = repo.create_branch("1-load-orders")
+    first = repo.commit_file(branch_name, "dags/new_dag.py", "# new DAG\n", "add DAG")
+    second = repo.commit_file(branch_name, "dags/sql/new.sql", "select 2\n", "add DDL")
+
+    assert repo.read("dags/new_dag.py", ref=branch_name) == "# new DAG\n"
+    # commits are built without checkout, the main worktree is untouched
+    assert not os.path.exists(os.path.join(repo.path, "dags", "new_dag.py"))
+    assert git("ls-remote", "--heads", remote["bare"], branch_name) == ""
+
+    assert repo.push(branch_name) is True
+    assert git("rev-list", f"main..{branch_name}", cwd=remote["bare"]).splitlines() == [second, first]
+    assert git("show", f"{branch_name}:dags/sql/new.sql", cwd=remote["bare"]) == "select 2"
+
+    # nothing left to push
+    assert repo.push(branch_name) is False
+
+
+def test_changed_paths(repo, remote):
+    seed = remote["seed"]
+    before = git("rev-parse", "HEAD", cwd=seed)
+    write(seed, "dags/load_orders.py", "# orders DAG v2\n")
+    write(seed, "dags/load_clients.py", "# clients DAG\n")
+    git("rm", "-q", "dags/sql/orders.sql", cwd=seed)
+    git("mv", "docs/README.md", "docs/index.md", cwd=seed)
+    git("add", "-A", cwd=seed)
+    git("commit", "-m", "update DAGs", cwd=seed)
+    git("push", "origin", "main", cwd=seed)
+    after = git("rev-parse", "HEAD", cwd=seed)
+
+    changed, removed = repo.changed_paths(before, after)
+
+    assert sorted(changed) == ["dags/load_clients.py", "dags/load_orders.py", "docs/index.md"]
+    assert sorted(removed) == ["dags/sql/orders.sql", "docs/README.md"]
+
+
+def test_credentials_are_not_stored(remote, tmp_path):
+    repo = LocalRepository(remote["url"], workdir=str(tmp_path / "auth"), sparse_paths=["dags"], auth_header="Authorization: Basic c2VjcmV0")
+
+    with open(os.path.join(repo.path, ".git", "config"), "r", encoding="utf-8") as f:
+        config = f.read()
+    assert "c2VjcmV0" not in config
+    assert git("remote", "get-url", "origin", cwd=repo.path) == remote["url"]
+
+
+def test_drop_branch_forgets_local_commits(repo, remote):
+    branch_name = repo.create_branch("2-drop")
+    repo.commit_file(branch_name, "dags/dropped.py", "# dropped\n", "add DAG")
+
+    repo.drop_branch(branch_name)
+
+    assert not repo.has_branch(branch_name)
+    assert repo.push(branch_name) is False
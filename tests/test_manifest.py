@@ -0,0 +1,59 @@
+from src.manifest import build_manifest, changed_fields, field_digests, stale_artifacts
+
+
+FIELDS = {
+    "source_database": "postgresql://user:password@db:5432/orders",
+    "source_table": "orders",
+    "source_table_ddl": "CREATE TABLE orders (id INT)",
+    "interval": "0 0 * * *",
+    "target_table": "raw.orders",
+    "data_quality": "count",
+}
+
+ARTIFACTS = [
+    {"filename": "dags/orders.py", "kind": "dag"},
+    {"filename": "dags/tasks/orders.py", "kind": "task"},
+    {"filename": "dags/sql/orders.sql", "kind": "ddl"},
+    {"filename": "dags/tasks/orders_dq.py", "kind": "dq"},
+    {"filename": "docs/orders.md", "kind": "doc"},
+]
+
+
+def test_manifest_keeps_digests_only():
+    manifest = build_manifest(5, "issue-5", FIELDS, ARTIFACTS)
+    assert manifest["issue_id"] == 5 and manifest["branch_name"] == "issue-5"
+    assert set(manifest["artifacts"]) == {x["filename"] for x in ARTIFACTS}
+    # credentials of the source database are not stored
+    assert "password" not in str(manifest)
+
+
+def test_changed_fields():
+    old = field_digests(FIELDS)
+    new = field_digests({**FIELDS, "interval": "@hourly", "capture_changes_column": "updated_at"})
+    del new["data_quality"]
+    assert changed_fields(old, new) == ["capture_changes_column", "data_quality", "interval"]
+
+
+def test_unchanged_issue_has_no_stale_artifacts():
+    assert stale_artifacts(build_manifest(5, "issue-5", FIELDS, ARTIFACTS), FIELDS) == {}
+
+
+def test_only_dependent_artifacts_are_stale():
+    manifest = build_manifest(5, "issue-5", FIELDS, ARTIFACTS)
+    assert stale_artifacts(manifest, {**FIELDS, "interval": "@hourly"}) == {
+        "dags/orders.py": ["interval"],
+        # documentation depends on all parameters
+        "docs/orders.md": ["interval"],
+    }
+    stale = stale_artifacts(manifest, {**FIELDS, "source_table_ddl": "CREATE TABLE orders (id BIGINT)"})
+    assert set(stale) == {"dags/tasks/orders.py", "dags/sql/orders.sql", "dags/tasks/orders_dq.py", "docs/orders.md"}
+
+
+def test_regenerated_artifacts_update_the_manifest():
+    manifest = build_manifest(5, "issue-5", FIELDS, ARTIFACTS)
+    fields = {**FIELDS, "interval": "@hourly"}
+    manifest = build_manifest(5, "issue-5", fields, [{"filename": "dags/orders.py", "kind": "dag"}], manifest)
+
+    # the DAG is up to date, the documentation was not regenerated and stays stale
+    assert stale_artifacts(manifest, fields) == {"docs/orders.md": ["interval"]}
+    assert len(manifest["artifacts"]) == len(ARTIFACTS)
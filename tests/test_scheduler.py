@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import Scheduler, issue_priority, issue_key
+
+
+def issue(project_id=1, iid=5, labels=()) -> dict:
+    return {
+        "project": {"id": project_id},
+        "object_attributes": {"id": 1000 + iid, "iid": iid, "labels": [{"title": x} for x in labels]},
+    }
+
+
+class Recorder():
+    """
+    Job function recording start order, a job runs until its gate is opened.
+    """
+    def __init__(self):
+        self.started = []
+        self.running = set()
+        self.max_running = 0
+        self.gates = {}
+
+    def gate(self, name) -> asyncio.Event:
+        return self.gates.setdefault(name, asyncio.Event())
+
+    async def __call__(self, name, fail=False):
+        self.started.append(name)
+        self.running.add(name)
+        self.max_running = max(self.max_running, len(self.running))
+        try:
+            await self.gate(name).wait()
+            if fail:
+                raise RuntimeError(name)
+            return name
+        finally:
+            self.running.discard(name)
+
+
+async def drain(recorder:Recorder, futures:list):
+    """
+    Open gates one by one in start order until all jobs are finished.
+    """
+    while not all(x.done() for x in futures):
+        await asyncio.sleep(0)
+        for name in list(recorder.running):
+            recorder.gate(name).set()
+    await asyncio.gather(*futures, return_exceptions=True)
+
+
+def test_issue_priority():
+    assert issue_priority(issue()) == 'normal'
+    assert issue_priority(issue(labels=['sandbox'])) == 'low'
+    assert issue_priority(issue(labels=['sandbox', 'priority::high'])) == 'high'
+    assert issue_priority({"labels": ['priority::low']}) == 'low'
+
+
+def test_issue_key_uses_project_iid():
+    assert issue_key(issue(project_id=3, iid=7)) == (3, 7)
+
+
+def test_strict_priority_between_classes():
+    async def main():
+        scheduler, recorder = Scheduler(max_concurrency=1, project_quota=1), Recorder()
+        futures = [scheduler.submit(recorder, "first", project_id=1)]
+        futures.append(scheduler.submit(recorder, "low", priority='low', project_id=2))
+        futures.append(scheduler.submit(recorder, "normal", priority='normal', project_id=3))
+        futures.append(scheduler.submit(recorder, "high", priority='high', project_id=4))
+        await drain(recorder, futures)
+        return recorder.started
+    assert asyncio.run(main()) == ["first", "high", "normal", "low"]
+
+
+def test_weighted_fairness_between_projects():
+    async def main():
+        scheduler, recorder = Scheduler(max_concurrency=1, project_quota=1, project_weights={"1": 2.0}), Recorder()
+        futures = [scheduler.submit(recorder, (project_id, n), project_id=project_id) for project_id in (1, 2) for n in range(6)]
+        await drain(recorder, futures)
+        return recorder.started
+    started = asyncio.run(main())
+    # project 1 has twice the weight and gets two runs for each run of project 2 while both have jobs
+    assert [project_id for project_id, _ in started[:6]].count(1) == 4
+    # jobs of one project keep submit order
+    assert [n for project_id, n in started if project_id == 2] == list(range(6))
+
+
+def test_project_quota():
+    async def main():
+        scheduler, recorder = Scheduler(max_concurrency=4, project_quota=1), Recorder()
+        futures = [scheduler.submit(recorder, f"a{n}", project_id=1) for n in range(3)]
+        futures.append(scheduler.submit(recorder, "b", project_id=2))
+        await asyncio.sleep(0)
+        running = set(recorder.running)
+        assert scheduler.inflight() == 4
+        await drain(recorder, futures)
+        return running, recorder.started
+    running, started = asyncio.run(main())
+    assert running == {"a0", "b"}
+    assert [x for x in started if x.startswith("a")] == ["a0", "a1", "a2"]
+
+
+def test_jobs_of_one_issue_run_one_at_a_time():
+    async def main():
+        scheduler, recorder = Scheduler(max_concurrency=4, project_quota=4), Recorder()
+        futures = [
+            scheduler.submit(recorder, "full", project_id=1, key=(1, 5)),
+            scheduler.submit(recorder, "update", project_id=1, key=(1, 5)),
+            scheduler.submit(recorder, "other", project_id=1, key=(1, 6)),
+        ]
+        await asyncio.sleep(0)
+        running = set(recorder.running)
+        recorder.gate("full").set()
+        await futures[0]
+        await asyncio.sleep(0)
+        running_after = set(recorder.running)
+        await drain(recorder, futures)
+        return running, running_after
+    running, running_after = asyncio.run(main())
+    # the update of a busy issue does not block other issues
+    assert running == {"full", "other"}
+    assert "update" in running_after
+
+
+def test_failed_job_releases_its_slot():
+    async def main():
+        scheduler, recorder = Scheduler(max_concurrency=1, project_quota=1), Recorder()
+        failed = scheduler.submit(recorder, "failed", fail=True, project_id=1, key=(1, 5))
+        after = scheduler.submit(recorder, "after", project_id=1, key=(1, 5))
+        await drain(recorder, [failed, after])
+        with pytest.raises(RuntimeError):
+            failed.result()
+        return after.result(), scheduler.inflight()
+    assert asyncio.run(main()) == ("after", 0)
@@ -0,0 +1,83 @@
+import os
+import json
+
+from src.spec import IssueSpec, issue_iid, parse_parameter_table
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def issue(description:str, **attrs) -> dict:
+    return {"object_attributes": {"id": 1005, "iid": 5, "title": "Load orders", "description": description, **attrs}}
+
+
+def test_issue_iid():
+    assert issue_iid(issue("")) == 5
+    # test payloads without iid
+    assert issue_iid({"object_attributes": {"id": 7}}) == 7
+
+
+def test_parse_parameter_table():
+    summary, fields = parse_parameter_table(
+        "Load orders daily\n\n| Parameter | Value |\n|---|---|\n| Source Table | orders |\n| interval | 0 0 * * * |\n"
+    )
+    assert summary == "Load orders daily"
+    assert fields == {"source_table": "orders", "interval": "0 0 * * *"}
+
+
+def test_description_without_table():
+    assert parse_parameter_table("  just text  ") == ("just text", {})
+    assert parse_parameter_table(None) == ("", {})
+
+
+def test_multiline_values_and_aliases():
+    spec = IssueSpec.from_issue(issue(
+        "| Parameter | Value |\n|:--|--:|\n"
+        "| ddl | CREATE TABLE orders (\n\tid INT,   \n\n\tname  TEXT\n) |\n"
+        "| schedule | @daily |\n"
+        "| database_available | Yes |\n"
+        "| owner | data-team |\n"
+        "| target_table | |\n"
+    ))
+    assert spec.issue_id == 5
+    assert spec.source_table_ddl == "CREATE TABLE orders (\nid INT,\nname TEXT\n)"
+    assert spec.interval == "@daily"
+    assert spec.database_available is True
+    # unknown parameters are kept, empty values are not set
+    assert spec.extra == {"owner": "data-team"}
+    assert spec.target_table is None
+
+
+def test_parameters_do_not_depend_on_formatting():
+    table = "| Parameter | Value |\n|---|---|\n| source_table | orders |\n| interval | 0 0 * * * |\n"
+    spaced = "| Parameter | Value |\n| --- | --- |\n|  source_table  |  orders   |\r\n| interval | 0 0 * * *|\n"
+    assert IssueSpec.from_issue(issue(table)).parameters() == IssueSpec.from_issue(issue(spaced)).parameters()
+
+
+def test_labels_and_prompt():
+    spec = IssueSpec.from_issue(issue(
+        "Copy orders\n| Parameter | Value |\n|---|---|\n| source_table | orders |\n| ddl | CREATE TABLE orders (\nid INT\n) |",
+        labels=[{"title": "database-to-datalake"}]
+    ))
+    assert spec.labels == ["database-to-datalake"]
+    assert spec.to_prompt().split("\n") == [
+        "issue_id: 5",
+        "issue_title: Load orders",
+        "labels: database-to-datalake",
+        "summary: Copy orders",
+        "source_table: orders",
+        "source_table_ddl: |",
+        "  CREATE TABLE orders (",
+        "  id INT",
+        "  )",
+    ]
+
+
+def test_sample_issue():
+    with open(os.path.join(ROOT, "temp_issue.json"), "r", encoding="utf-8") as f:
+        spec = IssueSpec.from_issue(json.load(f))
+    assert spec.source_table == "customers"
+    assert spec.target_storing_type == "full"
+    assert spec.database_available is True
+    assert spec.source_table_ddl.startswith("CREATE TABLE public.customers (\ncustomer_id UUID")
+    assert "\t" not in spec.source_table_ddl
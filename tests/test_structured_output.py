@@ -0,0 +1,72 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from openai import BadRequestError
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src import utils
+from src.utils import _load_json_object, is_structured_unsupported, repair_file_output, structured_supported
+
+
+def bad_request(message:str, param:str=None) -> BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "http://llm/v1/chat/completions"))
+    return BadRequestError(message, response=response, body={"message": message, "param": param})
+
+
+def test_load_json_object():
+    reply = 'Here is the file:\n```json\n{"filename": "dags/a.py", "content": "line 1\nline 2"}\n```'
+    assert _load_json_object(reply) == {"filename": "dags/a.py", "content": "line 1\nline 2"}
+    with pytest.raises(json.JSONDecodeError):
+        _load_json_object("no json here")
+
+
+def test_is_structured_unsupported():
+    assert is_structured_unsupported(bad_request("Invalid value", param="response_format"))
+    assert is_structured_unsupported(bad_request("response_format json_schema is not supported by this model"))
+    assert is_structured_unsupported(bad_request("Unrecognized request argument supplied: tools"))
+    # request content errors keep structured output on
+    assert not is_structured_unsupported(bad_request("This model's maximum context length is 8192 tokens"))
+    assert not is_structured_unsupported(bad_request("Invalid content of the message"))
+
+
+def test_unsupported_endpoint_is_rechecked(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(utils, "_structured_unsupported", {"endpoint|model|json_schema": 1000.0})
+
+    assert not structured_supported("endpoint|model|json_schema")
+    assert structured_supported("endpoint|model|function_calling")
+    now[0] += utils.STRUCTURED_RECHECK_SECONDS + 1
+    assert structured_supported("endpoint|model|json_schema")
+    assert utils._structured_unsupported == {}
+
+
+def use_model(monkeypatch, responses:list[str]):
+    model = FakeListChatModel(responses=responses)
+
+    async def get_model():
+        return model
+
+    monkeypatch.setattr(utils, "get_model", get_model)
+
+
+def test_repair_truncated_reply(monkeypatch):
+    # the model continues the reply from the last character
+    use_model(monkeypatch, ['ne 2", "commit_message": "add DAG"}'])
+    text = '{"filename": "dags/a.py", "description": "DAG", "content": "line 1\nli'
+
+    res = asyncio.run(repair_file_output(text, "prompt", {}))
+    assert (res.content, res.commit_message) == ("line 1\nline 2", "add DAG")
+
+
+def test_repair_missing_fields(monkeypatch):
+    # only the missing metadata is requested, the content is kept
+    use_model(monkeypatch, ['{"description": "orders DAG", "commit_message": "add orders DAG", "content": "other"}'])
+    text = '{"filename": "dags/orders.py", "content": "print(1)"}'
+
+    res = asyncio.run(repair_file_output(text, "prompt", {"file_name": "orders.py"}))
+    assert (res.filename, res.content) == ("dags/orders.py", "print(1)")
+    assert (res.description, res.commit_message) == ("orders DAG", "add orders DAG")
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from src.templates import TemplateIndex, git_blob_id
+
+
+class FakeGit():
+    """
+    Branch `main` of a project as {path: content}, counts downloaded files.
+    """
+    def __init__(self, files:dict):
+        self.files = dict(files)
+        self.head = "1" * 40
+        self.changed = ([], [])
+        self.downloads = []
+
+    def list_tree(self, root:str, ref:str) -> list[dict]:
+        return [{"path": path, "id": git_blob_id(content)} for path, content in self.files.items() if path.startswith(root + '/')]
+
+    def get_file_content(self, path:str, ref:str=None) -> str:
+        self.downloads.append(path)
+        return self.files.get(path)
+
+    def branch_head(self, ref:str) -> str:
+        return self.head
+
+    def changed_paths(self, before:str, after:str):
+        return self.changed
+
+
+@pytest.fixture
+def git():
+    return FakeGit({
+        "dags/load_orders.py": "# orders DAG\nschedule daily orders",
+        "dags/tasks/orders_quality.py": "# dq checks of orders",
+        "dags/sql/orders_ddl.sql": "create table orders",
+        "docs/orders.py": "# not a template",
+    })
+
+
+@pytest.fixture
+def index(git, tmp_path):
+    index = TemplateIndex(git, folder=str(tmp_path / "index"))
+    index.refresh()
+    return index
+
+
+def push(git, changed=(), removed=()) -> dict:
+    before, git.head = git.head, "2" * 40
+    git.changed = (list(changed), list(removed))
+    return {"ref": "refs/heads/main", "before": before, "after": git.head}
+
+
+def test_refresh_downloads_changed_blobs_only(git, index):
+    assert set(index.entries) == {"dags/load_orders.py", "dags/tasks/orders_quality.py", "dags/sql/orders_ddl.sql"}
+    assert index.entries["dags/tasks/orders_quality.py"]["kind"] == "dq"
+
+    git.files["dags/load_orders.py"] = "# orders DAG\nschedule hourly orders"
+    del git.files["dags/sql/orders_ddl.sql"]
+    assert index.refresh() == 1
+    assert "dags/sql/orders_ddl.sql" not in index.entries
+
+
+def test_best_template(index):
+    assert index.best_template("dag", "daily orders load") == "# orders DAG\nschedule daily orders"
+    assert index.best_template("ddl", "orders table") == "create table orders"
+
+
+def test_apply_push_ignores_paths_outside_root(git, index):
+    git.files["dags_old/legacy.py"] = "# legacy DAG"
+    git.files["dags/new_dag.py"] = "# new DAG"
+    git.downloads.clear()
+
+    assert index.apply_push(push(git, changed=["dags_old/legacy.py", "dags/new_dag.py"])) == 1
+    assert "dags_old/legacy.py" not in index.entries
+    assert git.downloads == ["dags/new_dag.py"]
+
+
+def test_apply_push_removes_files(git, index):
+    del git.files["dags/load_orders.py"]
+    index.apply_push(push(git, removed=["dags/load_orders.py"]))
+    assert "dags/load_orders.py" not in index.entries
+
+
+def test_apply_push_of_stale_head_syncs_tree(git, index):
+    git.files["dags/new_dag.py"] = "# new DAG"
+    payload = push(git, changed=["dags/new_dag.py"])
+    git.head = "3" * 40
+    git.downloads.clear()
+
+    assert index.apply_push(payload) == 1
+    assert "dags/new_dag.py" in index.entries
+
+
+def test_readers_are_not_blocked_by_refresh(git, index):
+    started, release = threading.Event(), threading.Event()
+    get_file_content = git.get_file_content
+
+    def slow_download(path, ref=None):
+        started.set()
+        release.wait(5)
+        return get_file_content(path, ref)
+
+    git.get_file_content = slow_download
+    git.files["dags/load_orders.py"] = "# orders DAG\nschedule hourly orders"
+    refresh = threading.Thread(target=index.refresh)
+    refresh.start()
+    try:
+        assert started.wait(5)
+        index.refreshed_at = 0.0
+        # stale index is served while another thread downloads files
+        assert index.best_template("dag", "orders") == "# orders DAG\nschedule daily orders"
+    finally:
+        release.set()
+        refresh.join()
+    assert index.best_template("dag", "orders") == "# orders DAG\nschedule hourly orders"
+
+
+def test_saved_index_is_reloaded(git, index):
+    other = TemplateIndex(git, folder=index.folder, max_age=3600)
+    other.load()
+    other.refreshed_at = float("inf")
+
+    git.files["dags/new_dag.py"] = "# new DAG"
+    index.apply_push(push(git, changed=["dags/new_dag.py"]))
+    # mtime granularity of the file system
+    other.loaded_mtime -= 1
+
+    assert other.best_template("dag", "new") == "# new DAG"